@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from aiohttp import web
+
+from llm import Llm
+from rag.database import Database
+from ratelimit import DEFAULT_LIMITS, RateLimitTimeout
+from singleflight import SingleFlight
+
+_DONE = object()
+
+
+class DiaryApi:
+    """
+    An asyncio HTTP API for programmatic clients, next to the Streamlit UI, around the same `Database` and `Llm`.
+
+    - `GET /health`
+    - `POST /retrieve` with `{"question": ...}` returns the retrieved diary entries.
+    - `POST /answer` with `{"question": ...}` streams Server-Sent Events: a `documents` event with the retrieved
+      entries, a `chunk` event per piece of the answer, and then `done`, or `error` if it failed or timed out.
+
+    `Database` and `Llm` block, so they run on threads.  At most `max_concurrency` requests are served at once, and a
+    request that can't get a slot within `queue_timeout` seconds gets a 503.  The default matches the Bedrock limiter's
+    concurrency cap, so requests past it are turned away here rather than waiting inside the limiter; if they do time
+    out in a limiter, `/retrieve` returns a 503 and `/answer` an `error` event with `"retryable": true`.  When a client disconnects, the answer
+    stream is closed after the chunk it is waiting on, which stops the Bedrock stream.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        llm: Llm,
+        single_flight: SingleFlight | None = None,
+        max_concurrency: int = DEFAULT_LIMITS["bedrock"]["max_concurrency"],
+        queue_timeout: float = 5.0,
+        retrieve_timeout: float = 30.0,
+        answer_timeout: float = 120.0,
+    ):
+        self._database = database
+        self._llm = llm
+        # identical concurrent questions, e.g. from several bots, only hit Pinecone and Bedrock once
+        self._single_flight = single_flight or SingleFlight()
+        self._max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._queue_timeout = queue_timeout
+        self._retrieve_timeout = retrieve_timeout
+        self._answer_timeout = answer_timeout
+
+    def application(self) -> web.Application:
+        application = web.Application()
+        application.add_routes(
+            [
+                web.get("/health", self._health),
+                web.post("/retrieve", self._retrieve),
+                web.post("/answer", self._answer),
+            ]
+        )
+        return application
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "ok",
+                "in_flight": self._in_flight,
+                "max_concurrency": self._max_concurrency,
+            }
+        )
+
+    async def _retrieve(self, request: web.Request) -> web.Response:
+        question = await _read_question(request)
+
+        async with self._slot():
+            try:
+                documents = await asyncio.wait_for(
+                    asyncio.to_thread(self._retrieve_documents, question),
+                    timeout=self._retrieve_timeout,
+                )
+            except TimeoutError:
+                raise web.HTTPGatewayTimeout(
+                    text=json.dumps({"error": "Retrieval timed out"}),
+                    content_type="application/json",
+                )
+            except RateLimitTimeout as e:
+                raise _service_unavailable(str(e))
+
+        return web.json_response(
+            {"documents": [_document_json(document) for document in documents]}
+        )
+
+    async def _answer(self, request: web.Request) -> web.StreamResponse:
+        question = await _read_question(request)
+
+        async with self._slot():
+            response = web.StreamResponse(
+                headers={
+                    "Content-Type": "text/event-stream",
+                    "Cache-Control": "no-cache",
+                }
+            )
+            await response.prepare(request)
+
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(self._answer_timeout):
+                    try:
+                        documents = await asyncio.wait_for(
+                            asyncio.to_thread(self._retrieve_documents, question),
+                            timeout=self._retrieve_timeout,
+                        )
+                    except TimeoutError:
+                        logging.warning(
+                            f"Retrieval timed out after {time.perf_counter() - start:.1f} seconds"
+                        )
+                        await _send_error_event(
+                            response, {"error": "Retrieval timed out"}
+                        )
+                        return response
+                    await _send_event(
+                        response,
+                        "documents",
+                        {
+                            "documents": [
+                                _document_json(document) for document in documents
+                            ]
+                        },
+                    )
+
+                    document_ids = tuple(document.get("_id") for document in documents)
+                    chunks = _iterate_in_thread(
+                        lambda: self._single_flight.stream(
+                            ("stream", question, document_ids),
+                            lambda: self._llm.stream(question, documents),
+                        )
+                    )
+                    # closed right away on a timeout or disconnect, not whenever it gets garbage collected
+                    async with aclosing(chunks):
+                        async for chunk in chunks:
+                            await _send_event(response, "chunk", {"text": chunk})
+
+                await _send_event(response, "done", {})
+            except TimeoutError:
+                logging.warning(
+                    f"Answer timed out after {time.perf_counter() - start:.1f} seconds"
+                )
+                await _send_error_event(response, {"error": "Answer timed out"})
+            except RateLimitTimeout as e:
+                logging.warning(e)
+                await _send_error_event(response, {"error": str(e), "retryable": True})
+            except ConnectionResetError:
+                logging.info("Client disconnected, cancelled the answer")
+            except asyncio.CancelledError:
+                logging.info("Request cancelled, cancelled the answer")
+                raise
+            except Exception as e:
+                logging.exception(e)
+                await _send_error_event(response, {"error": str(e)})
+
+            return response
+
+    def _retrieve_documents(self, question: str) -> list[dict[str, Any]]:
+        return self._single_flight.do(
+            ("retrieve", question),
+            lambda: self._database.retrieve_documents(question),
+        )
+
+    @asynccontextmanager
+    async def _slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self._queue_timeout)
+        except TimeoutError:
+            raise _service_unavailable("Too many requests in flight")
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+
+async def _iterate_in_thread(
+    function: Callable[[], Iterator[str]], buffer_size: int = 16
+) -> AsyncIterator[str]:
+    """
+    Iterates a blocking iterator on its own thread, at most `buffer_size` chunks ahead of a slow client.  When the
+    consumer stops early (cancelled, timed out, or the client is gone), the thread stops after the chunk it is waiting
+    on and closes the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    credits = threading.Semaphore(buffer_size)
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # the event loop is already closed, nobody is waiting for this
+            pass
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(function())
+            for chunk in iterator:
+                while not credits.acquire(timeout=0.1):
+                    if cancelled.is_set():
+                        break
+                if cancelled.is_set():
+                    break
+                put(chunk)
+        except BaseException as e:
+            put(e)
+        finally:
+            if iterator is not None and hasattr(iterator, "close"):
+                iterator.close()
+            put(_DONE)
+
+    threading.Thread(target=produce, name="api-answer", daemon=True).start()
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            credits.release()
+            yield item
+    finally:
+        cancelled.set()
+
+
+async def _read_question(request: web.Request) -> str:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": 'Expected a JSON body with a "question"'}),
+            content_type="application/json",
+        )
+    return question
+
+
+def _service_unavailable(error: str) -> web.HTTPServiceUnavailable:
+    return web.HTTPServiceUnavailable(
+        text=json.dumps({"error": error}),
+        content_type="application/json",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _send_event(response: web.StreamResponse, event: str, data: dict):
+    await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+
+async def _send_error_event(response: web.StreamResponse, data: dict):
+    try:
+        await _send_event(response, "error", data)
+    except ConnectionResetError:
+        # the client is already gone, there's nobody to tell
+        logging.info("Client disconnected before the error could be sent")
+
+
+def _document_json(document) -> dict[str, Any]:
+    """Only the parts of a retrieved entry clients need, under the API's own names."""
+    return {
+        "id": document["_id"],
+        "score": document["_score"],
+        "fields": dict(document["fields"]),
+    }
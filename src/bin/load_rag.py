@@ -3,6 +3,7 @@ import logging
 
 
 from rag.database import Database
+from rag.dedup import NearDuplicateDetector
 from rag.parser import DiaryParser
 
 
@@ -16,6 +17,8 @@ def main():
     logging.info("No data found in database.  Adding documents.")
     parser = DiaryParser(Path("data"))
     documents = parser.parse()
+    # recurring entries are stored once, with where else they occurred as metadata
+    documents = NearDuplicateDetector().deduplicate(documents)
     database.add_documents(documents)
 
 
@@ -0,0 +1,41 @@
+from pathlib import Path
+import logging
+
+
+from rag.database import Database
+from rag.parser import DiaryParser
+from rag.summarizer import (
+    SUMMARY_ID_PREFIX,
+    DiarySummarizer,
+    removed_summary_ids,
+    summary_ids,
+)
+
+
+def main():
+    database = Database()
+
+    parser = DiaryParser(Path("data"))
+    documents = parser.parse()
+
+    # only weeks, months, and categories whose entries changed since the last run are summarized again
+    existing_summaries = database.fetch_metadata(summary_ids(documents))
+    summaries = DiarySummarizer().summarize(documents, existing_summaries)
+
+    logging.info(f"Upserting {len(summaries)} new or changed summaries.")
+    database.add_documents(summaries)
+
+    # summaries of weeks, months, and categories whose files were removed
+    existing_ids = [
+        record_id
+        for ids in database.list_ids(prefix=SUMMARY_ID_PREFIX)
+        for record_id in ids
+    ]
+    removed_ids = removed_summary_ids(documents, existing_ids)
+    logging.info(f"Deleting {len(removed_ids)} summaries of removed entries.")
+    database.delete_ids(removed_ids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
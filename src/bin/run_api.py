@@ -0,0 +1,60 @@
+import argparse
+import logging
+import os
+
+from aiohttp import web
+
+from api import DiaryApi
+from llm import Llm
+from rag.database import Database
+from ratelimit import DEFAULT_LIMITS
+from routing import SMALL_MODEL_NAME, RoutingLlm
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serves retrieval and streamed answers over HTTP for programmatic clients."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_LIMITS["bedrock"]["max_concurrency"],
+        help="Requests served at once, the rest wait for a slot.  Defaults to the Bedrock limiter's concurrency cap",
+    )
+    parser.add_argument(
+        "--queue-timeout",
+        type=float,
+        default=5.0,
+        help="Seconds a request waits for a slot before getting a 503",
+    )
+    parser.add_argument("--retrieve-timeout", type=float, default=30.0)
+    parser.add_argument("--answer-timeout", type=float, default=120.0)
+    arguments = parser.parse_args()
+
+    llm = Llm()
+    if os.environ.get("LLM_ROUTING") == "true":
+        llm = RoutingLlm(Llm(SMALL_MODEL_NAME), llm)
+
+    api = DiaryApi(
+        Database(),
+        llm,
+        max_concurrency=arguments.max_concurrency,
+        queue_timeout=arguments.queue_timeout,
+        retrieve_timeout=arguments.retrieve_timeout,
+        answer_timeout=arguments.answer_timeout,
+    )
+
+    # cancels the handler, and with it the answer stream, when a client disconnects
+    web.run_app(
+        api.application(),
+        host=arguments.host,
+        port=arguments.port,
+        handler_cancellation=True,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -4,9 +4,11 @@ import os
 
 import iterator_chain
 
+from checkpoint import EvaluationCheckpoint, checkpoint_path
 from evaluator import Evaluator
 from llm import Llm
 from rag.database import Database
+from ratelimit import get_limiter
 
 
 def _load_dataset_from_csv():
@@ -42,11 +44,17 @@ def _evaluate_model(model_name: str):
     database = Database()
     dataset = _load_dataset_from_csv()
 
-    evaluator = Evaluator(llm, dataset, database)
+    # rerunning after a failure picks up from the datapoints that already finished
+    checkpoint = EvaluationCheckpoint(checkpoint_path(model_name), model_name, dataset)
+    evaluator = Evaluator(llm, dataset, database, checkpoint)
 
     evaluation = evaluator.evaluate()
 
     print(f"{model_name} evaluation result: {evaluation}")
+    print(f"{model_name} prompt cache usage: {llm.cache_usage()}")
+    print(
+        f"{model_name} rate limiter: {get_limiter(f'bedrock:{model_name}').metrics()}"
+    )
 
 
 def demo():
@@ -0,0 +1,98 @@
+import argparse
+import logging
+from pathlib import Path
+
+from llm import Llm
+from loadtest.harness import LoadTest, LoadTestReport
+from loadtest.stubs import Latency, StubChatModel, StubIndex, Throttle
+from rag.database import Database
+from rag.parser import DiaryParser
+from ratelimit import RateLimiter, all_metrics
+from singleflight import SingleFlight
+
+QUESTIONS = [
+    "What did I accomplish in January 2024?",
+    "What were my goals in week 29?",
+    "When did I have a 1x1 with my manager?",
+    "What did I work on with the metaphysics team?",
+    "Which to dos did I not finish?",
+    "What happened during sprint planning?",
+]
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Load test the chat path against local Pinecone and Bedrock stand-ins."
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,2,4,8,16,32",
+        help="Comma separated concurrency levels to sweep.",
+    )
+    parser.add_argument("--sessions", type=int, default=64, help="Sessions per level.")
+    parser.add_argument("--search-latency", type=float, default=0.25)
+    parser.add_argument("--first-token-latency", type=float, default=0.8)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--pinecone-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--pinecone-requests-per-second", type=float, default=None)
+    parser.add_argument("--bedrock-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--bedrock-requests-per-second", type=float, default=None)
+    parser.add_argument(
+        "--single-flight",
+        action="store_true",
+        help="Join identical concurrent questions like run_ui.py does.",
+    )
+    parser.add_argument(
+        "--no-rate-limit",
+        action="store_true",
+        help="Skip the client-side rate limiters and retries.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    arguments = _parse_arguments()
+
+    documents = DiaryParser(Path("data")).parse()
+    index = StubIndex(
+        documents,
+        search_latency=Latency(arguments.search_latency, arguments.latency_sigma),
+        throttle=Throttle(
+            arguments.pinecone_throttle_rate, arguments.pinecone_requests_per_second
+        ),
+    )
+    chat_model = StubChatModel(
+        response_tokens=arguments.response_tokens,
+        first_token_latency=Latency(
+            arguments.first_token_latency, arguments.latency_sigma
+        ),
+        token_latency=Latency(arguments.token_latency, arguments.latency_sigma),
+        throttle=Throttle(
+            arguments.bedrock_throttle_rate, arguments.bedrock_requests_per_second
+        ),
+    )
+
+    single_flight = SingleFlight() if arguments.single_flight else None
+    # an unlimited limiter that doesn't retry, otherwise the shared per-service limiters are used
+    limiter = RateLimiter("none", max_retries=0) if arguments.no_rate_limit else None
+    load_test = LoadTest(
+        Database(index, limiter),
+        Llm(chat_model=chat_model, limiter=limiter),
+        QUESTIONS,
+        single_flight,
+    )
+    concurrencies = [int(level) for level in arguments.concurrency.split(",")]
+
+    print(LoadTestReport.header())
+    for report in load_test.sweep(concurrencies, arguments.sessions):
+        print(report.format_row())
+
+    for name, metrics in all_metrics().items():
+        print(f"{name} rate limiter: {metrics}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
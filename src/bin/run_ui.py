@@ -1,9 +1,13 @@
 import logging
+import os
 
 import streamlit as st
 
 from rag.database import Database
 from llm import Llm
+from ratelimit import RateLimitTimeout
+from routing import SMALL_MODEL_NAME, RoutingLlm
+from singleflight import SingleFlight
 
 
 @st.cache_resource
@@ -12,8 +16,13 @@ def initialize_llm_components():
     database = Database()
 
     llm = Llm()
+    if os.environ.get("LLM_ROUTING") == "true":
+        llm = RoutingLlm(Llm(SMALL_MODEL_NAME), llm)
 
-    return database, llm
+    # shared by every session, so identical concurrent questions only hit Pinecone and Bedrock once
+    single_flight = SingleFlight()
+
+    return database, llm, single_flight
 
 
 def main():
@@ -23,7 +32,7 @@ def main():
     )
 
     # Initialize components
-    database, llm = initialize_llm_components()
+    database, llm, single_flight = initialize_llm_components()
 
     # Initialize chat history
     if "messages" not in st.session_state:
@@ -51,11 +60,18 @@ def main():
             try:
                 # Retrieve documents
                 with st.spinner("Retrieving relevant diary entries..."):
-                    retrieved_docs = database.retrieve_documents(prompt)
+                    retrieved_docs = single_flight.do(
+                        ("retrieve", prompt),
+                        lambda: database.retrieve_documents(prompt),
+                    )
 
                 # Stream the response
                 with st.spinner("Generating response..."):
-                    response_stream = llm.stream(prompt, retrieved_docs)
+                    document_ids = tuple(doc.get("_id") for doc in retrieved_docs)
+                    response_stream = single_flight.stream(
+                        ("stream", prompt, document_ids),
+                        lambda: llm.stream(prompt, retrieved_docs),
+                    )
 
                     for chunk in response_stream:
                         full_response += chunk
@@ -63,6 +79,12 @@ def main():
 
                     message_placeholder.markdown(full_response)
 
+            except RateLimitTimeout as e:
+                error_message = "Sorry, too many questions are being answered right now.  Please try again in a moment."
+                message_placeholder.markdown(error_message)
+                logging.warning(e)
+                full_response = error_message
+
             except Exception as e:
                 error_message = f"Sorry, I encountered an error: {str(e)}"
                 message_placeholder.markdown(error_message)
@@ -0,0 +1,37 @@
+import argparse
+import logging
+from pathlib import Path
+
+from rag.database import Database
+from rag.snapshot import NamespaceSnapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exports the diary namespace, embeddings included, to a local snapshot, or restores one without "
+        "re-embedding."
+    )
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument(
+        "path", type=Path, help="The snapshot file, e.g. diary.jsonl.gz"
+    )
+    parser.add_argument(
+        "--index",
+        default="diary",
+        help="The Pinecone index to export from or import into, e.g. to clone into a staging index",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    arguments = parser.parse_args()
+
+    database = Database(index_name=arguments.index)
+    snapshot = NamespaceSnapshot(arguments.path, max_workers=arguments.workers)
+
+    if arguments.action == "export":
+        snapshot.export(database)
+    else:
+        snapshot.restore(database)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
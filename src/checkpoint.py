@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any
+
+
+def dataset_fingerprint(dataset: list[dict[str, str]]) -> str:
+    return hashlib.sha256(json.dumps(dataset, sort_keys=True).encode()).hexdigest()
+
+
+class EvaluationCheckpoint:
+    """
+    An append-only JSON lines file of per-datapoint evaluation results.
+
+    The first line identifies the run (model and dataset fingerprint), and every following line is the result of one
+    datapoint, written as soon as it completes.  Rerunning with the same model and dataset resumes where it left off.
+    """
+
+    def __init__(self, path: Path, model_name: str, dataset: list[dict[str, str]]):
+        self._path = path
+        self._header = {
+            "model": model_name,
+            "dataset": dataset_fingerprint(dataset),
+            "size": len(dataset),
+        }
+        self._lock = threading.Lock()
+
+        self._total = len(dataset)
+        self._done = 0
+        self._completed_this_run = 0
+        self._seconds_this_run = 0.0
+
+    def load(self) -> dict[int, dict[str, Any]]:
+        """
+        The already completed results, by datapoint index.  Starts a new checkpoint file if there isn't one, or if its
+        header is empty or cut short, since results can't be matched to a run without it.
+        """
+        if not self._path.exists():
+            self._write_header()
+            return {}
+
+        results = {}
+        with self._path.open("r") as file:
+            try:
+                header = json.loads(file.readline())
+            except json.JSONDecodeError:
+                header = None
+
+            if isinstance(header, dict):
+                if header != self._header:
+                    raise ValueError(
+                        f"Checkpoint {self._path} is for model {header.get('model')} with a different dataset, "
+                        "delete it or use another path"
+                    )
+
+                for line in file:
+                    try:
+                        result = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line can be cut short if the previous run died while writing it
+                        logging.warning(
+                            f"Ignoring partial line in checkpoint {self._path}"
+                        )
+                        continue
+                    results[result["index"]] = result
+
+        if not isinstance(header, dict):
+            logging.warning(
+                f"Checkpoint {self._path} has no readable header, starting over"
+            )
+            self._write_header()
+            return {}
+
+        # terminate a partial last line so the next append starts on its own line
+        if not self._path.read_text().endswith("\n"):
+            with self._path.open("a") as file:
+                file.write("\n")
+
+        self._done = len(results)
+        logging.info(
+            f"Resuming {self._header['model']} with {self._done}/{self._total} datapoints done"
+        )
+        return results
+
+    def _write_header(self):
+        # written to a temporary file and renamed, so a crash never leaves a file without a complete header
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self._path.with_name(self._path.name + ".tmp")
+        with temporary_path.open("w") as file:
+            file.write(json.dumps(self._header) + "\n")
+        temporary_path.replace(self._path)
+
+    def append(self, result: dict[str, Any]):
+        with self._lock:
+            with self._path.open("a") as file:
+                file.write(json.dumps(result) + "\n")
+
+            self._done += 1
+            self._completed_this_run += 1
+            self._seconds_this_run += (
+                result["retrieve_seconds"] + result["generate_seconds"]
+            )
+
+    def progress(self) -> dict[str, Any]:
+        with self._lock:
+            remaining = self._total - self._done
+            eta_seconds = (
+                self._seconds_this_run / self._completed_this_run * remaining
+                if self._completed_this_run
+                else None
+            )
+            return {
+                "model": self._header["model"],
+                "done": self._done,
+                "total": self._total,
+                "eta_seconds": eta_seconds,
+            }
+
+    def format_progress(self) -> str:
+        progress = self.progress()
+        eta = (
+            f"ETA {progress['eta_seconds']:.0f}s"
+            if progress["eta_seconds"] is not None
+            else "ETA unknown"
+        )
+        return (
+            f"{progress['model']}: {progress['done']}/{progress['total']} done, {eta}"
+        )
+
+
+def checkpoint_path(model_name: str) -> Path:
+    # model names contain characters like `:` that don't belong in a filename
+    safe_name = "".join(
+        character if character.isalnum() or character in "-_." else "_"
+        for character in model_name
+    )
+    return Path("data") / "checkpoints" / f"{safe_name}.jsonl"
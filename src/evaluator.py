@@ -1,35 +1,75 @@
+import time
+
 from evaluate import load
 
+from checkpoint import EvaluationCheckpoint
 from llm import Llm
 from rag.database import Database
 
 
 class Evaluator:
-    def __init__(self, model: Llm, dataset: list[dict[str, str]], database: Database):
+    def __init__(
+        self,
+        model: Llm,
+        dataset: list[dict[str, str]],
+        database: Database,
+        checkpoint: EvaluationCheckpoint | None = None,
+    ):
         self._model = model
         self._database = database
         self._dataset = dataset
+        self._checkpoint = checkpoint
         self._metric = load("rouge")
 
     def evaluate(self) -> dict[str, float]:
         expecteds = []
         actuals = []
 
-        for datapoint in self._dataset:
-            print(".", end="")
+        completed = self._checkpoint.load() if self._checkpoint is not None else {}
 
+        for index, datapoint in enumerate(self._dataset):
             expecteds.append(datapoint["expected"])
 
             prompt = datapoint["prompt"]
-            retrieved_docs = self._database.retrieve_documents(prompt)
+            if index in completed and completed[index]["prompt"] == prompt:
+                actuals.append(completed[index]["answer"])
+                continue
 
-            full_response = ""
-            response_stream = self._model.stream(prompt, retrieved_docs)
-            for chunk in response_stream:
-                full_response += chunk
+            result = self._evaluate_datapoint(index, prompt)
+            actuals.append(result["answer"])
 
-            actuals.append(full_response)
+            if self._checkpoint is not None:
+                self._checkpoint.append(result)
+                print(self._checkpoint.format_progress())
+            else:
+                print(".", end="")
 
-        print("")  # print the newline
+        if self._checkpoint is None:
+            print("")  # print the newline
 
+        # only score once every datapoint has an answer
         return self._metric.compute(predictions=actuals, references=expecteds)
+
+    def _evaluate_datapoint(self, index: int, prompt: str) -> dict:
+        start = time.perf_counter()
+        retrieved_docs = self._database.retrieve_documents(prompt)
+        retrieve_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_token_seconds = None
+        full_response = ""
+        response_stream = self._model.stream(prompt, retrieved_docs)
+        for chunk in response_stream:
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            full_response += chunk
+
+        return {
+            "index": index,
+            "prompt": prompt,
+            "answer": full_response,
+            "retrieved_ids": [doc.get("_id") for doc in retrieved_docs],
+            "retrieve_seconds": retrieve_seconds,
+            "first_token_seconds": first_token_seconds,
+            "generate_seconds": time.perf_counter() - start,
+        }
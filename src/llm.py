@@ -1,45 +1,105 @@
+import logging
+import threading
 from typing import Any
 
 import iterator_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_aws import ChatBedrockConverse
 from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import PromptTemplate, format_document
+
+from ratelimit import RateLimiter, get_limiter
 
 
 class Llm:
-    def __init__(self, model_name="us.meta.llama3-2-90b-instruct-v1:0"):
-        basle_llm = ChatBedrockConverse(
-            model=model_name,
-            temperature=0.1,
-            region_name="us-east-1",
-        )
+    def __init__(
+        self,
+        model_name="us.meta.llama3-2-90b-instruct-v1:0",
+        chat_model: BaseChatModel | None = None,
+        limiter: RateLimiter | None = None,
+    ):
+        # Bedrock quotas are per model
+        self._limiter = limiter or get_limiter(f"bedrock:{model_name}")
+
+        if chat_model is None:
+            chat_model = ChatBedrockConverse(
+                model=model_name,
+                temperature=0.1,
+                region_name="us-east-1",
+            )
 
-        system_prompt = (
+        self._chat_model = chat_model
+
+        self._system_prompt = (
             "You are providing answers to questions about goals, accomplishments, and tasks in a diary.  "
             "Use only the following entries to answer the question.  Provide which entries, their category, their day of week, and filename you used to answer the question."
-            "Diary entries: {context}"
-        )
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt),
-                ("human", "Question: {input}"),
-            ]
         )
 
-        document_prompt = PromptTemplate(
+        self._document_prompt = PromptTemplate(
             template="content: {page_content}, category: {Category}, day: {Day of Week} , filename: {filename}",
             input_variables=["page_content", "Category", "Day of Week", "filename"],
             partial_variables={"Day of Week": ""},
         )
 
-        self._llm = create_stuff_documents_chain(
-            basle_llm, prompt, document_prompt=document_prompt
-        )
+        self._usage_lock = threading.Lock()
+        self._cache_read_tokens = 0
+        self._cache_write_tokens = 0
+        self._input_tokens = 0
 
     def stream(self, query: str, context: list[dict[str, Any]]):
         langchain_context = self._convert_pinecone_to_langchain(context)
-        return self._llm.stream({"context": langchain_context, "input": query})
+        messages = self._build_messages(query, langchain_context)
+        return self._limiter.stream(lambda: self._stream_messages(messages))
+
+    def cache_usage(self) -> dict[str, int]:
+        """Total input tokens, and how many of them were read from or written to the prompt cache."""
+        with self._usage_lock:
+            return {
+                "input_tokens": self._input_tokens,
+                "cache_read_tokens": self._cache_read_tokens,
+                "cache_write_tokens": self._cache_write_tokens,
+            }
+
+    def _build_messages(
+        self, query: str, documents: list[Document]
+    ) -> list[BaseMessage]:
+        """The fixed instructions, then the diary entries in the reranker's order, then the question."""
+        diary_entries = "\n\n".join(
+            format_document(document, self._document_prompt) for document in documents
+        )
+
+        return [
+            SystemMessage(content=self._system_prompt),
+            HumanMessage(
+                content=f"Diary entries: {diary_entries}\n\nQuestion: {query}"
+            ),
+        ]
+
+    def _stream_messages(self, messages: list[BaseMessage]):
+        usage = None
+        for chunk in self._chat_model.stream(messages):
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+            text = chunk.text()
+            if text:
+                yield text
+
+        if usage is not None:
+            self._record_usage(usage)
+
+    def _record_usage(self, usage: dict[str, Any]):
+        details = usage.get("input_token_details", {})
+        cache_read = details.get("cache_read", 0)
+        cache_write = details.get("cache_creation", 0)
+
+        logging.info(
+            f"Input tokens: {usage.get('input_tokens', 0)}, cache read: {cache_read}, cache write: {cache_write}"
+        )
+        with self._usage_lock:
+            self._input_tokens += usage.get("input_tokens", 0)
+            self._cache_read_tokens += cache_read
+            self._cache_write_tokens += cache_write
 
     def _convert_pinecone_to_langchain(
         self,
@@ -55,8 +115,23 @@ class Llm:
         self,
         pinecone_dictionary: dict[str, Any],
     ) -> Document:
-        page_content = pinecone_dictionary["fields"]["text"]
-        metadata = pinecone_dictionary["fields"]
-        del metadata["text"]
+        fields = pinecone_dictionary["fields"]
+        page_content = fields["text"]
+        occurrences = fields.get("Occurrences")
+        if occurrences:
+            # a deduplicated entry stands in for all its near-duplicates, so say where they came from
+            count = fields.get("Occurrence Count", len(occurrences))
+            if count > len(occurrences):
+                page_content += (
+                    f" (recorded {count} times, from {fields.get('First Occurrence')} to "
+                    f"{fields.get('Last Occurrence')}, including: {'; '.join(occurrences)})"
+                )
+            else:
+                page_content += f" (recorded {count} times: {'; '.join(occurrences)})"
+        variants = fields.get("Variants")
+        if variants:
+            page_content += f" (also recorded as: {'; '.join(variants)})"
+        # copied rather than deleting "text" in place, the hits can be shared with other callers
+        metadata = {key: value for key, value in fields.items() if key != "text"}
 
         return Document(page_content=page_content, metadata=metadata)
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from llm import Llm
+from rag.database import Database
+from singleflight import SingleFlight
+
+
+@dataclass
+class SessionResult:
+    retrieve_seconds: float
+    first_token_seconds: float | None
+    total_seconds: float
+    error: str | None = None
+
+
+@dataclass
+class LoadTestReport:
+    concurrency: int
+    sessions: int
+    errors: int
+    wall_seconds: float
+    throughput: float
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    first_token_p50: float
+    first_token_p95: float
+    retrieve_p95: float
+
+    def format_row(self) -> str:
+        return (
+            f"{self.concurrency:>11} {self.sessions:>8} {self.errors:>6} {self.throughput:>10.2f} "
+            f"{self.latency_p50:>8.3f} {self.latency_p95:>8.3f} {self.latency_p99:>8.3f} "
+            f"{self.first_token_p50:>8.3f} {self.first_token_p95:>8.3f} {self.retrieve_p95:>8.3f}"
+        )
+
+    @staticmethod
+    def header() -> str:
+        return (
+            f"{'concurrency':>11} {'sessions':>8} {'errors':>6} {'sessions/s':>10} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'ttft p50':>8} {'ttft p95':>8} {'rtrv p95':>8}"
+        )
+
+
+class LoadTest:
+    """
+    Runs simulated chat sessions concurrently through the same `Database.retrieve_documents` -> `Llm.stream` path
+    that `run_ui.py` uses, one thread per session just like Streamlit.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        llm: Llm,
+        questions: list[str],
+        single_flight: SingleFlight | None = None,
+    ):
+        self._database = database
+        self._llm = llm
+        self._questions = questions
+        self._single_flight = single_flight
+        self._question_index = 0
+        self._question_lock = threading.Lock()
+
+    def run(self, concurrency: int, sessions: int) -> LoadTestReport:
+        logging.info(f"Running {sessions} sessions at concurrency {concurrency}")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: self._run_session(), range(sessions)))
+        wall_seconds = time.perf_counter() - start
+
+        return self._report(concurrency, results, wall_seconds)
+
+    def sweep(self, concurrencies: list[int], sessions_per_level: int):
+        for concurrency in concurrencies:
+            yield self.run(concurrency, sessions_per_level)
+
+    def _run_session(self) -> SessionResult:
+        question = self._next_question()
+        start = time.perf_counter()
+        retrieve_seconds = 0.0
+        first_token_seconds = None
+
+        try:
+            retrieved_docs = self._retrieve(question)
+            retrieve_seconds = time.perf_counter() - start
+
+            full_response = ""
+            for chunk in self._stream(question, retrieved_docs):
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                full_response += chunk
+        except Exception as e:
+            return SessionResult(
+                retrieve_seconds,
+                first_token_seconds,
+                time.perf_counter() - start,
+                error=type(e).__name__,
+            )
+
+        return SessionResult(
+            retrieve_seconds, first_token_seconds, time.perf_counter() - start
+        )
+
+    def _retrieve(self, question: str):
+        if self._single_flight is None:
+            return self._database.retrieve_documents(question)
+
+        return self._single_flight.do(
+            ("retrieve", question),
+            lambda: self._database.retrieve_documents(question),
+        )
+
+    def _stream(self, question: str, retrieved_docs):
+        if self._single_flight is None:
+            return self._llm.stream(question, retrieved_docs)
+
+        document_ids = tuple(doc.get("_id") for doc in retrieved_docs)
+        return self._single_flight.stream(
+            ("stream", question, document_ids),
+            lambda: self._llm.stream(question, retrieved_docs),
+        )
+
+    def _next_question(self) -> str:
+        with self._question_lock:
+            question = self._questions[self._question_index % len(self._questions)]
+            self._question_index += 1
+        return question
+
+    def _report(
+        self, concurrency: int, results: list[SessionResult], wall_seconds: float
+    ) -> LoadTestReport:
+        successes = [result for result in results if result.error is None]
+        latencies = [result.total_seconds for result in successes]
+        first_tokens = [
+            result.first_token_seconds
+            for result in successes
+            if result.first_token_seconds is not None
+        ]
+        retrieves = [result.retrieve_seconds for result in successes]
+
+        return LoadTestReport(
+            concurrency=concurrency,
+            sessions=len(results),
+            errors=len(results) - len(successes),
+            wall_seconds=wall_seconds,
+            throughput=len(successes) / wall_seconds if wall_seconds > 0 else 0.0,
+            latency_p50=percentile(latencies, 50),
+            latency_p95=percentile(latencies, 95),
+            latency_p99=percentile(latencies, 99),
+            first_token_p50=percentile(first_tokens, 50),
+            first_token_p95=percentile(first_tokens, 95),
+            retrieve_p95=percentile(retrieves, 95),
+        )
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile.  Returns 0 for an empty list."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
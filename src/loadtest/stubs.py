@@ -0,0 +1,311 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Iterator
+
+from botocore.exceptions import ClientError
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pinecone import Vector
+from pinecone.core.openapi.db_data.models import (
+    Hit,
+    ListItem,
+    ListResponse,
+    Pagination,
+    SearchRecordsResponse,
+    SearchRecordsResponseResult,
+    SearchUsage,
+)
+from pinecone.db_data.dataclasses import FetchResponse
+from pinecone.db_data.vector_factory import VectorFactory
+from pinecone.exceptions import PineconeApiException
+from pydantic import ConfigDict, Field
+
+
+class Latency:
+    """A log-normal latency distribution described by its median and spread (sigma)."""
+
+    def __init__(self, median: float = 0.0, sigma: float = 0.0):
+        self._median = median
+        self._sigma = sigma
+
+    def sample(self) -> float:
+        if self._median <= 0:
+            return 0.0
+        if self._sigma <= 0:
+            return self._median
+        return random.lognormvariate(math.log(self._median), self._sigma)
+
+    def sleep(self):
+        seconds = self.sample()
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class Throttle:
+    """Decides whether a call is throttled, either randomly or because a requests-per-second quota is exceeded."""
+
+    def __init__(
+        self, throttle_rate: float = 0.0, requests_per_second: float | None = None
+    ):
+        self._throttle_rate = throttle_rate
+        self._requests_per_second = requests_per_second
+        self._recent_calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def should_throttle(self) -> bool:
+        if self._throttle_rate > 0 and random.random() < self._throttle_rate:
+            return True
+
+        if self._requests_per_second is None:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            while self._recent_calls and now - self._recent_calls[0] >= 1.0:
+                self._recent_calls.popleft()
+            if len(self._recent_calls) >= self._requests_per_second:
+                return True
+            self._recent_calls.append(now)
+
+        return False
+
+
+class StubIndex:
+    """
+    An in-memory stand-in for a Pinecone `Index` with integrated embedding and reranking.
+
+    Scoring is a simple word overlap, which is enough to return a realistic number of hits.  Calls sleep for a
+    configurable latency and raise the same 429 `PineconeApiException` Pinecone does when throttled.
+    """
+
+    def __init__(
+        self,
+        documents: list[dict[str, Any]] | None = None,
+        search_latency: Latency | None = None,
+        upsert_latency: Latency | None = None,
+        throttle: Throttle | None = None,
+    ):
+        self._search_latency = search_latency or Latency()
+        self._upsert_latency = upsert_latency or Latency()
+        self._throttle = throttle or Throttle()
+        self._records: dict[str, dict[str, Any]] = {}
+        # embeddings of records that were upserted with precomputed vectors
+        self._values: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+        for document in documents or []:
+            self._store(document)
+
+    def search(self, namespace: str, query: dict[str, Any], fields=None, rerank=None):
+        self._search_latency.sleep()
+        self._raise_if_throttled()
+
+        query_words = _words(query["inputs"]["text"])
+        with self._lock:
+            records = list(self._records.values())
+        if "filter" in query:
+            records = [
+                record for record in records if _matches(record, query["filter"])
+            ]
+
+        scored = []
+        for record in records:
+            overlap = len(query_words & _words(record["text"]))
+            scored.append((overlap / (len(query_words) or 1), record))
+        scored.sort(key=lambda score_and_record: score_and_record[0], reverse=True)
+
+        top_n = rerank["top_n"] if rerank else query["top_k"]
+        hits = [
+            Hit(
+                _id=record["_id"],
+                _score=score,
+                # copied, because callers are free to mutate the fields they get back
+                fields={key: value for key, value in record.items() if key != "_id"},
+            )
+            for score, record in scored[: min(query["top_k"], top_n)]
+        ]
+
+        # the same models the real `Index.search` returns
+        return SearchRecordsResponse(
+            result=SearchRecordsResponseResult(hits=hits),
+            usage=SearchUsage(read_units=1),
+        )
+
+    def upsert_records(self, namespace: str, records: list[dict[str, Any]]):
+        self._upsert_latency.sleep()
+        self._raise_if_throttled()
+
+        for record in records:
+            self._store(record)
+
+    def upsert(
+        self, vectors: list[dict[str, Any]], namespace: str | None = None, **kwargs
+    ):
+        self._upsert_latency.sleep()
+        self._raise_if_throttled()
+
+        for vector in vectors:
+            # validates the vector the way the Pinecone client does before sending it
+            VectorFactory.build(vector)
+            self._store({"_id": vector["id"], **vector.get("metadata", {})})
+            with self._lock:
+                self._values[vector["id"]] = list(vector["values"])
+
+    def delete(self, ids: list[str], namespace: str | None = None, **kwargs):
+        self._upsert_latency.sleep()
+        self._raise_if_throttled()
+
+        with self._lock:
+            for id in ids:
+                self._records.pop(id, None)
+                self._values.pop(id, None)
+
+    def list_paginated(
+        self,
+        prefix: str | None = None,
+        namespace: str | None = None,
+        limit: int | None = None,
+        pagination_token: str | None = None,
+        **kwargs,
+    ) -> ListResponse:
+        self._search_latency.sleep()
+        self._raise_if_throttled()
+
+        limit = limit or 100
+        start = int(pagination_token or 0)
+        with self._lock:
+            ids = sorted(id for id in self._records if id.startswith(prefix or ""))[
+                start : start + limit + 1
+            ]
+
+        response = ListResponse(
+            namespace=namespace or "",
+            vectors=[ListItem(id=id) for id in ids[:limit]],
+        )
+        if len(ids) > limit:
+            # the token is just the offset of the next page
+            response.pagination = Pagination(next=str(start + limit))
+        return response
+
+    def fetch(self, ids: list[str], namespace: str | None = None) -> FetchResponse:
+        self._search_latency.sleep()
+        self._raise_if_throttled()
+
+        with self._lock:
+            records = [self._records[id] for id in ids if id in self._records]
+            values = dict(self._values)
+
+        return FetchResponse(
+            namespace=namespace or "",
+            vectors={
+                record["_id"]: Vector(
+                    id=record["_id"],
+                    values=values.get(record["_id"]) or _embed(record.get("text", "")),
+                    # like Pinecone, a record without metadata has None rather than {}
+                    metadata={
+                        key: value for key, value in record.items() if key != "_id"
+                    }
+                    or None,
+                )
+                for record in records
+            },
+            usage={"read_units": 1},
+        )
+
+    def describe_index_stats(self, **kwargs) -> dict[str, Any]:
+        with self._lock:
+            return {"total_vector_count": len(self._records)}
+
+    def _store(self, record: dict[str, Any]):
+        record = dict(record)
+        with self._lock:
+            record.setdefault("_id", str(len(self._records)))
+            self._records[record["_id"]] = record
+            self._values.pop(record["_id"], None)
+
+    def _raise_if_throttled(self):
+        if self._throttle.should_throttle():
+            raise PineconeApiException(status=429, reason="Too Many Requests")
+
+
+class StubChatModel(BaseChatModel):
+    """
+    A stand-in for `ChatBedrockConverse` that streams a canned answer.
+
+    Time to first token and the pacing between tokens follow configurable latency distributions, and throttled calls
+    raise the same `ThrottlingException` Bedrock does.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    response_tokens: int = 64
+    first_token_latency: Latency = Field(default_factory=Latency)
+    token_latency: Latency = Field(default_factory=Latency)
+    throttle: Throttle = Field(default_factory=Throttle)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat-model"
+
+    def _generate(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        text = "".join(
+            chunk.message.content for chunk in self._stream(messages, stop, **kwargs)
+        )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(text))])
+
+    def _stream(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.throttle.should_throttle():
+            raise ClientError(
+                {
+                    "Error": {
+                        "Code": "ThrottlingException",
+                        "Message": "Too many requests",
+                    }
+                },
+                "ConverseStream",
+            )
+
+        self.first_token_latency.sleep()
+        for token_number in range(self.response_tokens):
+            if token_number > 0:
+                self.token_latency.sleep()
+            token = f"token{token_number} "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def _matches(record: dict[str, Any], metadata_filter: dict[str, Any]) -> bool:
+    """Supports the subset of Pinecone's metadata filter language that `Database` uses."""
+    for field, condition in metadata_filter.items():
+        value = record.get(field)
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            # a record without the field, like a raw entry, matches $nin
+            if operator == "$nin" and value in operand:
+                return False
+    return True
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _embed(text: str) -> list[float]:
+    """A deterministic stand-in for the index's integrated embedding."""
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return [byte / 255 for byte in digest]
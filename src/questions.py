@@ -0,0 +1,31 @@
+import re
+
+_MONTHS = (
+    r"jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober)?|nov(ember)?|"
+    r"dec(ember)?"
+)
+
+# questions about a whole period or about everything, which need many entries or the summary tier
+_BROAD_QUESTION_RE = re.compile(
+    r"\b(summar\w*|overall|overview|all|every\w*|accomplish\w*|achieve\w*|highlights?|year|month|quarter|"
+    r"january|february|march|april|june|july|august|september|october|november|december|\d{4})\b",
+    re.IGNORECASE,
+)
+# questions about a specific day, date, week, or entry, even when they also mention a month or year
+_SPECIFIC_QUESTION_RE = re.compile(
+    r"\b(when|which day|what day|who|on (monday|tuesday|wednesday|thursday|friday|saturday|sunday)|week \d+|"
+    rf"({_MONTHS})\.? \d{{1,2}}(st|nd|rd|th)?|\d{{1,2}}(st|nd|rd|th)? of ({_MONTHS})|"
+    r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2})\b",
+    re.IGNORECASE,
+)
+
+
+def is_broad_question(query: str) -> bool:
+    """
+    Whether a question is about a whole period or about everything (e.g. "What did I accomplish in 2024?"), rather
+    than a lookup of something specific (e.g. "What did I accomplish on March 6, 2023?").  Retrieval and model routing
+    both use it, so they agree on what counts as broad.
+    """
+    return bool(_BROAD_QUESTION_RE.search(query)) and not _SPECIFIC_QUESTION_RE.search(
+        query
+    )
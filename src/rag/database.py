@@ -1,15 +1,28 @@
 import itertools
 import os
 import uuid
+from typing import Iterator
 
 import iterator_chain
 from pinecone import Pinecone, IndexEmbed
 
+from questions import is_broad_question
+from rag.summarizer import SUMMARY_ID_PREFIX, SUMMARY_RECORD_TYPES
+from ratelimit import RateLimiter, get_limiter
+
 
 class Database:
-    def __init__(self):
-        index_name = "diary"
+    def __init__(
+        self, index=None, limiter: RateLimiter | None = None, index_name="diary"
+    ):
         self._namespace = "diary"
+        self._limiter = limiter or get_limiter("pinecone")
+
+        if index is not None:
+            # a pre-built index (e.g. the local stand-in used for load testing)
+            self._index = index
+            return
+
         self._pinecone = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
 
         if not self._pinecone.has_index(index_name):
@@ -30,29 +43,132 @@ class Database:
     def add_documents(self, documents: list[dict[str, str]]):
         documents = (
             iterator_chain.from_iterable(documents)
-            .map(lambda document: {**document, "_id": str(uuid.uuid4())})
+            # records like summaries bring their own stable ID so they can be replaced later
+            .map(lambda document: {"_id": str(uuid.uuid4()), **document})
             .list()
         )
 
         for documents_chunk in self._chunks(documents):
-            self._index.upsert_records(self._namespace, documents_chunk)
+            self._limiter.call(
+                lambda: self._index.upsert_records(self._namespace, documents_chunk)
+            )
 
     def retrieve_documents(self, query: str) -> list[dict[str, str]]:
-        results = self._index.search(
-            namespace=self._namespace,
-            query={"top_k": 20, "inputs": {"text": query}},
-            fields=["*"],
-            rerank={
-                "model": "bge-reranker-v2-m3",
-                "top_n": 15,
-                "rank_fields": ["text"],
-            },
+        """
+        Broad questions search the summary tier first and fill the rest with raw entries.  Everything else only
+        searches the raw entries.
+        """
+        raw_entries_filter = {"Record Type": {"$nin": SUMMARY_RECORD_TYPES}}
+
+        if not is_broad_question(query):
+            return self._search(query, raw_entries_filter, top_k=20, top_n=15)
+
+        summaries = self._search(
+            query, {"Record Type": {"$in": SUMMARY_RECORD_TYPES}}, top_k=10, top_n=5
         )
+        if not summaries:
+            return self._search(query, raw_entries_filter, top_k=20, top_n=15)
+
+        return summaries + self._search(query, raw_entries_filter, top_k=10, top_n=5)
+
+    def fetch_metadata(self, ids: list[str]) -> dict[str, dict]:
+        """The metadata of the records with the given IDs, skipping IDs that don't exist."""
+        metadata = {}
+        for ids_chunk in self._chunks(ids, batch_size=100):
+            response = self._limiter.call(
+                lambda: self._index.fetch(ids=ids_chunk, namespace=self._namespace)
+            )
+            for record_id, vector in response.vectors.items():
+                metadata[record_id] = vector.metadata or {}
+
+        return metadata
+
+    def list_ids(self, page_size=100, prefix: str | None = None) -> Iterator[list[str]]:
+        """Pages of the IDs of every record in the namespace, or only those starting with `prefix`."""
+        pagination_token = None
+        while True:
+            response = self._limiter.call(
+                lambda: self._index.list_paginated(
+                    prefix=prefix,
+                    namespace=self._namespace,
+                    limit=page_size,
+                    pagination_token=pagination_token,
+                )
+            )
+            ids = [item.id for item in response.vectors]
+            if ids:
+                yield ids
 
-        return results["result"]["hits"]
+            if not response.pagination or not response.pagination.next:
+                return
+            pagination_token = response.pagination.next
+
+    def fetch_vectors(self, ids: list[str]) -> list[dict]:
+        """The ID, embedding, and metadata of the records with the given IDs, skipping IDs that don't exist."""
+        response = self._limiter.call(
+            lambda: self._index.fetch(ids=ids, namespace=self._namespace)
+        )
+        vectors = []
+        for vector in response.vectors.values():
+            fetched = {"id": vector.id, "values": vector.values}
+            # records without metadata come back with None, which upsert rejects
+            if vector.metadata is not None:
+                fetched["metadata"] = vector.metadata
+            vectors.append(fetched)
+        return vectors
+
+    def upsert_vectors(self, vectors: list[dict]):
+        """Upserts records with precomputed embeddings, like the ones from `fetch_vectors`, without re-embedding."""
+        for vectors_chunk in self._chunks(vectors, batch_size=100):
+            self._limiter.call(
+                lambda: self._index.upsert(
+                    vectors=vectors_chunk,
+                    namespace=self._namespace,
+                    show_progress=False,
+                )
+            )
+
+    def delete_ids(self, ids: list[str]):
+        """Deletes the records with the given IDs."""
+        for ids_chunk in self._chunks(ids, batch_size=1000):
+            self._limiter.call(
+                lambda: self._index.delete(ids=ids_chunk, namespace=self._namespace)
+            )
 
     def has_data(self) -> bool:
-        return self._index.describe_index_stats()["total_vector_count"] > 0
+        """Whether the raw diary entries are loaded.  Summary records alone don't count."""
+        total = self._index.describe_index_stats()["total_vector_count"]
+        if total == 0:
+            return False
+
+        summaries = sum(len(ids) for ids in self.list_ids(prefix=SUMMARY_ID_PREFIX))
+        return total > summaries
+
+    def _search(
+        self, query: str, metadata_filter: dict, top_k: int, top_n: int
+    ) -> list[dict[str, str]]:
+        results = self._limiter.call(
+            lambda: self._index.search(
+                namespace=self._namespace,
+                query={
+                    "top_k": top_k,
+                    "inputs": {"text": query},
+                    "filter": metadata_filter,
+                },
+                fields=["*"],
+                rerank={
+                    "model": "bge-reranker-v2-m3",
+                    "top_n": top_n,
+                    "rank_fields": ["text"],
+                },
+            )
+        )
+
+        # Pinecone's `Hit` models can't be deep copied, so callers get plain dicts they can share, copy, and mutate
+        return [
+            {"_id": hit["_id"], "_score": hit["_score"], "fields": dict(hit["fields"])}
+            for hit in results["result"]["hits"]
+        ]
 
     def _chunks(self, iterable, batch_size=96):
         """A helper function to break an iterable into chunks of size batch_size."""
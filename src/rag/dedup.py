@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import random
+import re
+from collections import defaultdict
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# list markers and checkboxes aren't part of what an entry says, checkbox state is compared separately
+_MARKUP_RE = re.compile(r"^\s*-\s*(\[[ xX]\]\s*)?", re.MULTILINE)
+_CHECKBOX_RE = re.compile(r"^\s*-\s*\[([ xX])\]")
+_WORD_RE = re.compile(r"\w+")
+
+
+class NearDuplicateDetector:
+    """
+    Clusters near-duplicate diary entries, like recurring standups and 1x1s, with MinHash and locality-sensitive
+    hashing.
+
+    Each entry becomes a set of word shingles, and its MinHash signature is split into bands.  Entries that share a
+    band are candidates, and candidates whose estimated Jaccard similarity reaches `threshold` end up in the same
+    cluster.  Only entries of the same category and checkbox state are compared, since a goal and a note saying the
+    same thing are different facts, and so are an open to do and the same to do once it's done.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_permutations: int = 128,
+        bands: int = 32,
+        shingle_size: int = 2,
+        seed: int = 1,
+        max_listed_occurrences: int = 10,
+        max_variants: int = 3,
+    ):
+        if num_permutations % bands != 0:
+            raise ValueError("num_permutations must be a multiple of bands")
+
+        self._threshold = threshold
+        self._num_permutations = num_permutations
+        self._bands = bands
+        self._rows = num_permutations // bands
+        self._shingle_size = shingle_size
+        # a daily standup over years of diary would otherwise carry thousands of occurrences into its metadata
+        self._max_listed_occurrences = max_listed_occurrences
+        self._max_variants = max_variants
+
+        generator = random.Random(seed)
+        self._permutations = [
+            (
+                generator.randint(1, _MERSENNE_PRIME - 1),
+                generator.randint(0, _MERSENNE_PRIME - 1),
+            )
+            for _ in range(num_permutations)
+        ]
+
+    def deduplicate(self, documents: list[dict[str, str]]) -> list[dict]:
+        """
+        Returns one representative per cluster, the first entry of the cluster.  Representatives of clusters with
+        more than one entry get an `Occurrence Count`, the `First Occurrence` and `Last Occurrence` by filename, an
+        `Occurrences` list of "filename, day" for up to `max_listed_occurrences` of the entries in filename order, and
+        a `Variants` list of up to `max_variants` of the other entries' texts that aren't identical to the
+        representative's.
+        """
+        clusters = self.cluster(documents)
+
+        representatives = []
+        for cluster in clusters:
+            representative = dict(documents[cluster[0]])
+            if len(cluster) > 1:
+                occurrences = [
+                    _describe_occurrence(documents[index])
+                    for index in sorted(
+                        cluster, key=lambda index: documents[index]["filename"]
+                    )
+                ]
+                representative["Occurrence Count"] = len(cluster)
+                representative["First Occurrence"] = occurrences[0]
+                representative["Last Occurrence"] = occurrences[-1]
+                representative["Occurrences"] = occurrences[
+                    : self._max_listed_occurrences
+                ]
+                variants = list(
+                    dict.fromkeys(
+                        documents[index]["text"]
+                        for index in cluster[1:]
+                        if documents[index]["text"] != representative["text"]
+                    )
+                )
+                if variants:
+                    representative["Variants"] = variants[: self._max_variants]
+            representatives.append(representative)
+
+        logging.info(
+            f"Deduplicated {len(documents)} entries into {len(representatives)}"
+        )
+        return representatives
+
+    def cluster(self, documents: list[dict[str, str]]) -> list[list[int]]:
+        """Clusters of document indexes, each sorted, in order of their first document."""
+        signatures = [self._signature(document["text"]) for document in documents]
+
+        buckets: dict[tuple, list[int]] = defaultdict(list)
+        for index, (document, signature) in enumerate(zip(documents, signatures)):
+            for band in range(self._bands):
+                band_values = tuple(
+                    signature[band * self._rows : (band + 1) * self._rows]
+                )
+                buckets[
+                    (
+                        document.get("Category"),
+                        _checkbox_state(document["text"]),
+                        band,
+                        band_values,
+                    )
+                ].append(index)
+
+        parents = list(range(len(documents)))
+
+        def find(index: int) -> int:
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        for candidates in buckets.values():
+            first = candidates[0]
+            for other in candidates[1:]:
+                if find(first) == find(other):
+                    continue
+                if self._similarity(signatures[first], signatures[other]) >= (
+                    self._threshold
+                ):
+                    parents[max(find(first), find(other))] = min(
+                        find(first), find(other)
+                    )
+
+        clusters: dict[int, list[int]] = defaultdict(list)
+        for index in range(len(documents)):
+            clusters[find(index)].append(index)
+
+        return sorted(clusters.values(), key=lambda cluster: cluster[0])
+
+    def _signature(self, text: str) -> list[int]:
+        shingle_hashes = [_hash(shingle) for shingle in self._shingles(text)]
+        if not shingle_hashes:
+            shingle_hashes = [0]
+
+        return [
+            min(
+                ((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH
+                for value in shingle_hashes
+            )
+            for a, b in self._permutations
+        ]
+
+    def _shingles(self, text: str) -> set[str]:
+        words = _WORD_RE.findall(_MARKUP_RE.sub("", text).lower())
+        if len(words) <= self._shingle_size:
+            return {" ".join(words)} if words else set()
+
+        return {
+            " ".join(words[index : index + self._shingle_size])
+            for index in range(len(words) - self._shingle_size + 1)
+        }
+
+    def _similarity(self, first: list[int], second: list[int]) -> float:
+        """The estimated Jaccard similarity of the shingle sets the two signatures came from."""
+        return sum(a == b for a, b in zip(first, second)) / self._num_permutations
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big"
+    )
+
+
+def _checkbox_state(text: str) -> str | None:
+    checkbox = _CHECKBOX_RE.match(text)
+    return checkbox.group(1).lower() if checkbox else None
+
+
+def _describe_occurrence(document: dict[str, str]) -> str:
+    if "Day of Week" in document:
+        return f"{document['filename']}, {document['Day of Week']}"
+    return document["filename"]
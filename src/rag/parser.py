@@ -1,11 +1,23 @@
+import bisect
 import itertools
 import logging
+from dataclasses import dataclass
 from pathlib import Path
 import re
-from typing import Optional
+from typing import Callable, Optional
 
 import iterator_chain
 
+# One match per non-blank line: a heading, a list item (with its checkbox), or any other text.  Every match ends at
+# the line's last non-blank character, so entry spans come straight from the match offsets.
+_LINE_RE = re.compile(
+    r"^(?:(?P<heading>##?)[^\S\n]+(?P<title>[^\n]*)"
+    r"|(?P<item>-(?= ))(?: \[(?P<checkbox>[ xX])\])?"
+    r"|[^\S\n]*(?P<text>)(?=\S))"
+    r"(?:[^\n]*\S)?",
+    re.MULTILINE,
+)
+
 
 class DiaryParser:
     def __init__(self, diary_folder: Path):
@@ -28,55 +40,194 @@ class DiaryParser:
     def _parse_file(self, diary_file_path: Path) -> list[dict[str, str]]:
         logging.info(f"Parsing file {diary_file_path}")
 
-        text = diary_file_path.read_text()
-        lines = text.splitlines()
-
-        docs: list[dict[str, str]] = []
-        current_category: Optional[str] = None  # H1
-        current_day: Optional[str] = None  # H2
-        content = ""
-
-        h1_re = re.compile(r"^#\s+(.*)$")
-        h2_re = re.compile(r"^##\s+(.*)$")
-
-        for raw_line in lines:
-            line = raw_line.rstrip("\n")
-            # Header tracking
-            m1 = h1_re.match(line)
-            if m1:
-                current_category = m1.group(1).strip()
-                current_day = None  # reset day when a new category starts
-                continue
-            m2 = h2_re.match(line)
-            if m2:
-                current_day = m2.group(1).strip()
-                continue
-
-            if line.startswith("- "):
-                # we're starting a new item, finish the previous one
-                if content:
-                    doc_dict = {"filename": diary_file_path.name}
-                    if current_category:
-                        doc_dict["Category"] = current_category
-                    if current_day:
-                        doc_dict["Day of Week"] = current_day
-                    # trim whitespace
-                    content = content.strip()
-                    doc_dict["text"] = content
-                    docs.append(doc_dict)
-                content = ""
-
-            content += f"{line}\n"
-
-        if content:
-            doc_dict = {"filename": diary_file_path.name}
-            if current_category:
-                doc_dict["Category"] = current_category
-            if current_day:
-                doc_dict["Day of Week"] = current_day
-            # trim whitespace
-            content = content.strip()
-            doc_dict["text"] = content
-            docs.append(doc_dict)
-
-        return docs
+        return parse_diary_text(
+            diary_file_path.name, diary_file_path.read_text()
+        ).documents()
+
+
+@dataclass(slots=True)
+class DiaryEntry:
+    """An entry of a diary file, as the span of the file's text it came from rather than a copy of it."""
+
+    start: int
+    end: int
+    category: Optional[str]  # H1
+    day: Optional[str]  # H2
+    status: Optional[str]  # checkbox state of list items like "- [x] ..."
+
+
+@dataclass
+class ParsedDiaryFile:
+    filename: str
+    text: str
+    entries: list[DiaryEntry]
+
+    def documents(self) -> list[dict[str, str]]:
+        documents = []
+        for entry in self.entries:
+            document = {"filename": self.filename}
+            if entry.category:
+                document["Category"] = entry.category
+            if entry.day:
+                document["Day of Week"] = entry.day
+            if entry.status:
+                document["Status"] = entry.status
+            document["text"] = self.text[entry.start : entry.end]
+            document["Start Offset"] = entry.start
+            document["End Offset"] = entry.end
+            documents.append(document)
+
+        return documents
+
+
+def parse_diary_text(filename: str, text: str) -> ParsedDiaryFile:
+    """
+    Splits a diary file into entries in a single scan.  `# ` headings set the category and `## ` headings the day, a
+    `- ` list item starts an entry, and any other non-blank line continues the current entry (or starts one if there is
+    none).  An entry ends at the next list item or heading.
+    """
+    entries, _ = _scan(text, 0, None, None)
+    return ParsedDiaryFile(filename, text, entries)
+
+
+def reparse_diary_text(previous: ParsedDiaryFile, text: str) -> ParsedDiaryFile:
+    """
+    Parses an edited version of `previous`'s text, only scanning the lines around the edit.
+
+    Scanning restarts at the last entry that starts before the line of the first changed character, and stops at the
+    first list item past the edit that started an entry in the previous version under the same headings.  The entries
+    from there on are reused, shifted by how much the edit grew or shrank the file.
+    """
+    old_text = previous.text
+    if text == old_text:
+        return ParsedDiaryFile(previous.filename, text, previous.entries)
+
+    prefix = _common_prefix_length(old_text, text)
+    suffix = _common_suffix_length(
+        old_text, text, limit=min(len(old_text), len(text)) - prefix
+    )
+    delta = len(text) - len(old_text)
+    edit_line_start = text.rfind("\n", 0, prefix) + 1
+
+    # the entry before the edit may continue into it, so it's scanned again
+    restart_index = bisect.bisect_left(
+        previous.entries, edit_line_start, key=lambda entry: entry.start
+    )
+    if restart_index == 0:
+        restart_position, category, day = 0, None, None
+    else:
+        restart_index -= 1
+        restart = previous.entries[restart_index]
+        restart_position = text.rfind("\n", 0, restart.start) + 1
+        category, day = restart.category, restart.day
+
+    old_entry_indexes = {
+        entry.start: index for index, entry in enumerate(previous.entries)
+    }
+
+    def resync(position: int, category: Optional[str], day: Optional[str]) -> bool:
+        # past the edit, including the newline before the item, the old and new text are the same
+        if position <= len(text) - suffix:
+            return False
+        old_index = old_entry_indexes.get(position - delta)
+        if old_index is None:
+            return False
+        old_entry = previous.entries[old_index]
+        return old_entry.category == category and old_entry.day == day
+
+    scanned, resync_position = _scan(text, restart_position, category, day, resync)
+
+    entries = previous.entries[:restart_index] + scanned
+    if resync_position is not None:
+        entries += [
+            DiaryEntry(
+                entry.start + delta,
+                entry.end + delta,
+                entry.category,
+                entry.day,
+                entry.status,
+            )
+            for entry in previous.entries[old_entry_indexes[resync_position - delta] :]
+        ]
+    logging.info(
+        f"Reparsed characters {restart_position} to {resync_position or len(text)} of {previous.filename}"
+    )
+
+    return ParsedDiaryFile(previous.filename, text, entries)
+
+
+def _scan(
+    text: str,
+    position: int,
+    category: Optional[str],
+    day: Optional[str],
+    resync: Optional[Callable[[int, Optional[str], Optional[str]], bool]] = None,
+) -> tuple[list[DiaryEntry], Optional[int]]:
+    """
+    Scans `text` from `position`, the start of a line, with the headings in effect there.  Returns the entries, and
+    the position of the list item scanning stopped at because `resync` returned True for it.
+    """
+    entries: list[DiaryEntry] = []
+    # the open entry, from its first non-blank character to the end of its last non-blank line
+    entry_start = entry_end = -1
+    status: Optional[str] = None
+
+    for line in _LINE_RE.finditer(text, position):
+        if line["text"] is not None:
+            # continuation line, or the start of an entry that isn't a list item
+            if entry_start < 0:
+                entry_start, status = line.start("text"), None
+            entry_end = line.end()
+            continue
+
+        if entry_start >= 0:
+            entries.append(DiaryEntry(entry_start, entry_end, category, day, status))
+            entry_start = -1
+
+        if line["heading"] is not None:
+            title = line["title"].strip()
+            if len(line["heading"]) == 1:
+                category = title
+                day = None  # reset day when a new category starts
+            else:
+                day = title
+            continue
+
+        entry_start = line.start()
+        if resync is not None and resync(entry_start, category, day):
+            return entries, entry_start
+
+        checkbox = line["checkbox"]
+        status = None if checkbox is None else "Open" if checkbox == " " else "Done"
+        entry_end = line.end()
+
+    if entry_start >= 0:
+        entries.append(DiaryEntry(entry_start, entry_end, category, day, status))
+
+    return entries, None
+
+
+def _common_prefix_length(first: str, second: str) -> int:
+    """Binary search with slice comparisons, so the characters are compared in C rather than one at a time."""
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if second.startswith(first[low:middle], low):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(first: str, second: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if (
+            first[len(first) - middle : len(first) - low]
+            == second[len(second) - middle : len(second) - low]
+        ):
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,135 @@
+import gzip
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from rag.database import Database
+
+SNAPSHOT_FORMAT = "diary-snapshot"
+SNAPSHOT_VERSION = 2
+
+
+class NamespaceSnapshot:
+    """
+    Exports the records of the diary namespace, with their embeddings and metadata, to a local file, and restores
+    them by upserting the embeddings directly so nothing is re-embedded.
+
+    The file is gzipped JSON lines.  The first line is a header, each line after it is a chunk of records the size of
+    one list page, so both export and restore stream a chunk at a time instead of holding the namespace in memory, and
+    the last line is a trailer with the record count.  The file is only moved into place once the export finished, and
+    a file whose trailer is missing or doesn't match is never restored.
+    """
+
+    def __init__(self, path: Path, max_workers: int = 8):
+        self._path = path
+        self._max_workers = max_workers
+
+    def export(self, database: Database) -> int:
+        """Writes every record in the namespace to the snapshot and returns how many were written."""
+        start = time.perf_counter()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        # a failed export would still leave a valid gzip file behind, so it's written elsewhere and moved into place
+        temporary_path = self._path.with_name(self._path.name + ".tmp")
+        record_count = 0
+        try:
+            with gzip.open(temporary_path, "wt", encoding="utf-8") as snapshot_file:
+                snapshot_file.write(
+                    json.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION})
+                    + "\n"
+                )
+
+                # listing is sequential because each page needs the previous page's token, but fetches overlap it
+                pages = database.list_ids()
+                for chunk in self._bounded_map(database.fetch_vectors, pages):
+                    snapshot_file.write(json.dumps(chunk) + "\n")
+                    record_count += len(chunk)
+
+                snapshot_file.write(json.dumps({"records": record_count}) + "\n")
+        except BaseException:
+            temporary_path.unlink(missing_ok=True)
+            raise
+        temporary_path.replace(self._path)
+
+        logging.info(
+            f"Exported {record_count} records to {self._path} in {time.perf_counter() - start:.1f} seconds"
+        )
+        return record_count
+
+    def restore(self, database: Database) -> int:
+        """Upserts every record in the snapshot and returns how many were upserted."""
+        start = time.perf_counter()
+
+        # checked up front, so an incomplete snapshot is rejected before anything is upserted
+        self.verify()
+
+        def upsert(chunk: list[dict]) -> int:
+            database.upsert_vectors(chunk)
+            return len(chunk)
+
+        record_count = sum(self._bounded_map(upsert, self.chunks()))
+
+        logging.info(
+            f"Restored {record_count} records from {self._path} in {time.perf_counter() - start:.1f} seconds"
+        )
+        return record_count
+
+    def verify(self) -> int:
+        """Reads the whole snapshot and returns its record count, or raises ValueError if it's incomplete."""
+        return sum(len(chunk) for chunk in self.chunks())
+
+    def chunks(self) -> Iterator[list[dict]]:
+        """
+        The chunks of records in the snapshot, read lazily.  Raises ValueError after the last chunk if the trailer is
+        missing or its count doesn't match, so use `verify` first to check a snapshot before acting on its chunks.
+        """
+        with gzip.open(self._path, "rt", encoding="utf-8") as snapshot_file:
+            header = json.loads(next(snapshot_file, "null"))
+            if (
+                not isinstance(header, dict)
+                or header.get("format") != SNAPSHOT_FORMAT
+                or header.get("version") != SNAPSHOT_VERSION
+            ):
+                raise ValueError(
+                    f"{self._path} is not a version {SNAPSHOT_VERSION} snapshot"
+                )
+
+            record_count = 0
+            trailer = None
+            for line in snapshot_file:
+                if trailer is not None:
+                    raise ValueError(f"{self._path} has records after its trailer")
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    trailer = item
+                    continue
+                record_count += len(item)
+                yield item
+
+            if trailer is None:
+                raise ValueError(
+                    f"{self._path} is incomplete, the export that wrote it didn't finish"
+                )
+            if trailer.get("records") != record_count:
+                raise ValueError(
+                    f"{self._path} has {record_count} records but its trailer says {trailer.get('records')}"
+                )
+
+    def _bounded_map(self, function, items) -> Iterator:
+        """
+        Like `ThreadPoolExecutor.map`, in order, but only pulls the next item when a worker is free so a large input
+        is never read into memory all at once.
+        """
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            pending: deque[Future] = deque()
+            for item in items:
+                if len(pending) >= self._max_workers:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(function, item))
+
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,424 @@
+import hashlib
+import json
+import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_aws import ChatBedrockConverse
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from ratelimit import RateLimiter, get_limiter
+
+WEEK_SUMMARY = "week_summary"
+MONTH_SUMMARY = "month_summary"
+CATEGORY_SUMMARY = "category_summary"
+CATEGORY_MONTH_SUMMARY = "category_month_summary"
+SUMMARY_RECORD_TYPES = [
+    WEEK_SUMMARY,
+    MONTH_SUMMARY,
+    CATEGORY_SUMMARY,
+    CATEGORY_MONTH_SUMMARY,
+]
+SUMMARY_ID_PREFIX = "summary-"
+
+# diary files are named like "2024-01 (week 3).md"
+_MONTH_RE = re.compile(r"^(\d{4}-\d{2})")
+
+
+class DiarySummarizer:
+    """
+    Builds the summary tier of the index with map-reduce summarization over the parsed diary.
+
+    - A week summary per diary file, from its entries.
+    - A month summary per month, reduced from the month's week summaries.
+    - A category summary per category and month, from the category's entries in that month.
+    - A category summary per category (Goals, Notes, ...), reduced from the category's month summaries.
+
+    Every summary records a hash of what it was built from, so only summaries whose source changed are regenerated.
+    """
+
+    def __init__(
+        self,
+        model_name="us.meta.llama3-2-90b-instruct-v1:0",
+        chat_model: BaseChatModel | None = None,
+        limiter: RateLimiter | None = None,
+        max_chunk_characters: int = 12000,
+        max_workers: int = 4,
+    ):
+        if chat_model is None:
+            chat_model = ChatBedrockConverse(
+                model=model_name,
+                temperature=0.1,
+                region_name="us-east-1",
+            )
+
+        self._chat_model = chat_model
+        self._limiter = limiter or get_limiter(f"bedrock:{model_name}")
+        self._max_chunk_characters = max_chunk_characters
+        self._max_workers = max_workers
+
+    def summarize(
+        self,
+        documents: list[dict[str, Any]],
+        existing_summaries: dict[str, dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        """
+        Returns the summary records that are missing or stale compared to `existing_summaries`, the metadata of the
+        summary records already in the index by ID.
+        """
+        documents_by_file: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        documents_by_category: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for document in documents:
+            documents_by_file[document["filename"]].append(document)
+            if "Category" in document:
+                documents_by_category[document["Category"]].append(document)
+
+        week_hashes = {
+            filename: _hash_documents(file_documents)
+            for filename, file_documents in documents_by_file.items()
+        }
+
+        stale_weeks = [
+            filename
+            for filename, source_hash in week_hashes.items()
+            if _source_hash(existing_summaries, summary_id(WEEK_SUMMARY, filename))
+            != source_hash
+        ]
+        logging.info(f"Summarizing {len(stale_weeks)} changed weeks")
+        week_summaries = dict(
+            zip(
+                stale_weeks,
+                self._parallel(
+                    lambda filename: self._summarize_texts(
+                        f"the diary week {filename}",
+                        [_format_document(d) for d in documents_by_file[filename]],
+                    ),
+                    stale_weeks,
+                ),
+            )
+        )
+
+        records = [
+            _record(
+                WEEK_SUMMARY,
+                filename,
+                week_summaries[filename],
+                week_hashes[filename],
+                filename=filename,
+                category="Week Summary",
+            )
+            for filename in stale_weeks
+        ]
+
+        records += self._summarize_months(
+            documents_by_file, week_hashes, week_summaries, existing_summaries
+        )
+        records += self._summarize_categories(documents_by_category, existing_summaries)
+
+        return records
+
+    def _summarize_months(
+        self,
+        documents_by_file: dict[str, list[dict[str, Any]]],
+        week_hashes: dict[str, str],
+        week_summaries: dict[str, str],
+        existing_summaries: dict[str, dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        files_by_month: dict[str, list[str]] = defaultdict(list)
+        for filename in sorted(documents_by_file):
+            month_match = _MONTH_RE.match(filename)
+            if month_match:
+                files_by_month[month_match.group(1)].append(filename)
+
+        month_hashes = {
+            month: _hash_strings([week_hashes[filename] for filename in filenames])
+            for month, filenames in files_by_month.items()
+        }
+        stale_months = [
+            month
+            for month, source_hash in month_hashes.items()
+            if _source_hash(existing_summaries, summary_id(MONTH_SUMMARY, month))
+            != source_hash
+        ]
+        logging.info(f"Summarizing {len(stale_months)} changed months")
+
+        def summarize_month(month: str) -> str:
+            week_texts = []
+            for filename in files_by_month[month]:
+                # unchanged weeks reuse the summary already in the index
+                week_summary = week_summaries.get(filename) or existing_summaries.get(
+                    summary_id(WEEK_SUMMARY, filename), {}
+                ).get("text")
+                if week_summary is None:
+                    week_summary = self._summarize_texts(
+                        f"the diary week {filename}",
+                        [_format_document(d) for d in documents_by_file[filename]],
+                    )
+                week_texts.append(f"{filename}: {week_summary}")
+            return self._summarize_texts(f"the month {month}", week_texts)
+
+        return [
+            _record(
+                MONTH_SUMMARY,
+                month,
+                summary,
+                month_hashes[month],
+                filename=", ".join(files_by_month[month]),
+                category="Month Summary",
+            )
+            for month, summary in zip(
+                stale_months, self._parallel(summarize_month, stale_months)
+            )
+        ]
+
+    def _summarize_categories(
+        self,
+        documents_by_category: dict[str, list[dict[str, Any]]],
+        existing_summaries: dict[str, dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        # an edit to one week only regenerates its category's month, and the category is reduced from the months
+        documents_by_category_month: dict[tuple[str, str], list[dict[str, Any]]] = (
+            defaultdict(list)
+        )
+        for category, category_documents in documents_by_category.items():
+            for document in category_documents:
+                documents_by_category_month[
+                    (category, _month(document["filename"]))
+                ].append(document)
+
+        category_month_hashes = {
+            category_month: _hash_documents(category_month_documents)
+            for category_month, category_month_documents in documents_by_category_month.items()
+        }
+        stale_category_months = [
+            category_month
+            for category_month, source_hash in category_month_hashes.items()
+            if _source_hash(
+                existing_summaries,
+                summary_id(
+                    CATEGORY_MONTH_SUMMARY, _category_month_key(*category_month)
+                ),
+            )
+            != source_hash
+        ]
+        logging.info(
+            f"Summarizing {len(stale_category_months)} changed category months"
+        )
+
+        def summarize_category_month(category_month: tuple[str, str]) -> str:
+            category, month = category_month
+            return self._summarize_texts(
+                f"the diary category {category} in {month}",
+                [
+                    _format_document(d, with_filename=True)
+                    for d in documents_by_category_month[category_month]
+                ],
+            )
+
+        category_month_summaries = dict(
+            zip(
+                stale_category_months,
+                self._parallel(summarize_category_month, stale_category_months),
+            )
+        )
+        records = [
+            _record(
+                CATEGORY_MONTH_SUMMARY,
+                _category_month_key(category, month),
+                category_month_summaries[(category, month)],
+                category_month_hashes[(category, month)],
+                filename=", ".join(
+                    sorted(
+                        {
+                            d["filename"]
+                            for d in documents_by_category_month[(category, month)]
+                        }
+                    )
+                ),
+                category=f"{category} Summary",
+            )
+            for category, month in stale_category_months
+        ]
+
+        months_by_category: dict[str, list[str]] = defaultdict(list)
+        for category, month in sorted(documents_by_category_month):
+            months_by_category[category].append(month)
+
+        category_hashes = {
+            category: _hash_strings(
+                [category_month_hashes[(category, month)] for month in months]
+            )
+            for category, months in months_by_category.items()
+        }
+        stale_categories = [
+            category
+            for category, source_hash in category_hashes.items()
+            if _source_hash(existing_summaries, summary_id(CATEGORY_SUMMARY, category))
+            != source_hash
+        ]
+        logging.info(f"Summarizing {len(stale_categories)} changed categories")
+
+        def summarize_category(category: str) -> str:
+            month_texts = []
+            for month in months_by_category[category]:
+                # unchanged months reuse the summary already in the index
+                month_summary = category_month_summaries.get(
+                    (category, month)
+                ) or existing_summaries.get(
+                    summary_id(
+                        CATEGORY_MONTH_SUMMARY, _category_month_key(category, month)
+                    ),
+                    {},
+                ).get("text")
+                if month_summary is None:
+                    month_summary = summarize_category_month((category, month))
+                month_texts.append(f"{month}: {month_summary}")
+            return self._summarize_texts(f"the diary category {category}", month_texts)
+
+        records += [
+            _record(
+                CATEGORY_SUMMARY,
+                category,
+                summary,
+                category_hashes[category],
+                filename="all files",
+                category=f"{category} Summary",
+            )
+            for category, summary in zip(
+                stale_categories, self._parallel(summarize_category, stale_categories)
+            )
+        ]
+        return records
+
+    def _summarize_texts(self, scope: str, texts: list[str]) -> str:
+        """Map-reduce: summarizes chunks of `texts` that fit the budget, then summarizes the summaries."""
+        chunks = self._chunk(texts)
+        if len(chunks) == 1:
+            return self._summarize(scope, chunks[0])
+
+        partial_summaries = [self._summarize(scope, chunk) for chunk in chunks]
+        if len(partial_summaries) < len(texts):
+            return self._summarize_texts(scope, partial_summaries)
+        # summaries that still don't fit together can't be reduced further in chunks
+        return self._summarize(scope, "\n".join(partial_summaries))
+
+    def _chunk(self, texts: list[str]) -> list[str]:
+        chunks = []
+        current: list[str] = []
+        current_characters = 0
+        for text in texts:
+            if current and current_characters + len(text) > self._max_chunk_characters:
+                chunks.append("\n".join(current))
+                current, current_characters = [], 0
+            current.append(text)
+            current_characters += len(text)
+
+        chunks.append("\n".join(current))
+        return chunks
+
+    def _summarize(self, scope: str, text: str) -> str:
+        messages = [
+            SystemMessage(
+                content="You summarize an engineering diary.  Keep concrete accomplishments, goals, tasks, people, "
+                "projects, and which day or file they came from.  Don't add anything that isn't in the entries."
+            ),
+            HumanMessage(content=f"Summarize {scope}:\n{text}"),
+        ]
+        return self._limiter.call(lambda: self._chat_model.invoke(messages)).text()
+
+    def _parallel(self, function, items: list) -> list:
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            return list(executor.map(function, items))
+
+
+def summary_id(record_type: str, key: str) -> str:
+    return f"{SUMMARY_ID_PREFIX}{record_type}-{key}"
+
+
+def summary_ids(documents: list[dict[str, Any]]) -> list[str]:
+    """Every summary record ID the documents can produce, for looking up their existing hashes."""
+    ids = set()
+    for document in documents:
+        ids.add(summary_id(WEEK_SUMMARY, document["filename"]))
+        month_match = _MONTH_RE.match(document["filename"])
+        if month_match:
+            ids.add(summary_id(MONTH_SUMMARY, month_match.group(1)))
+        if "Category" in document:
+            ids.add(summary_id(CATEGORY_SUMMARY, document["Category"]))
+            ids.add(
+                summary_id(
+                    CATEGORY_MONTH_SUMMARY,
+                    _category_month_key(
+                        document["Category"], _month(document["filename"])
+                    ),
+                )
+            )
+    return sorted(ids)
+
+
+def removed_summary_ids(
+    documents: list[dict[str, Any]], existing_ids: list[str]
+) -> list[str]:
+    """The IDs among `existing_ids` of summaries that the documents no longer produce, like those of removed files."""
+    current_ids = set(summary_ids(documents))
+    return sorted(
+        record_id
+        for record_id in existing_ids
+        if record_id.startswith(SUMMARY_ID_PREFIX) and record_id not in current_ids
+    )
+
+
+def _month(filename: str) -> str:
+    """The month of a diary file, or the filename itself for files not named by month."""
+    month_match = _MONTH_RE.match(filename)
+    return month_match.group(1) if month_match else filename
+
+
+def _category_month_key(category: str, month: str) -> str:
+    return f"{category}-{month}"
+
+
+def _record(
+    record_type: str,
+    key: str,
+    text: str,
+    source_hash: str,
+    filename: str,
+    category: str,
+) -> dict[str, Any]:
+    return {
+        "_id": summary_id(record_type, key),
+        "text": text,
+        "Record Type": record_type,
+        "Source Hash": source_hash,
+        "filename": filename,
+        "Category": category,
+    }
+
+
+def _source_hash(
+    existing_summaries: dict[str, dict[str, Any]], record_id: str
+) -> str | None:
+    return existing_summaries.get(record_id, {}).get("Source Hash")
+
+
+def _format_document(document: dict[str, Any], with_filename=False) -> str:
+    parts = [document["text"]]
+    if "Day of Week" in document:
+        parts.append(f"day: {document['Day of Week']}")
+    if with_filename:
+        parts.append(f"filename: {document['filename']}")
+    return ", ".join(parts)
+
+
+def _hash_documents(documents: list[dict[str, Any]]) -> str:
+    return _hash_strings(
+        [json.dumps(document, sort_keys=True) for document in documents]
+    )
+
+
+def _hash_strings(strings: list[str]) -> str:
+    return hashlib.sha256("\n".join(strings).encode()).hexdigest()
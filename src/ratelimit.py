@@ -0,0 +1,296 @@
+import contextlib
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from botocore.exceptions import ClientError
+
+_THROTTLING_ERROR_CODES = {
+    "throttlingexception",
+    "toomanyrequestsexception",
+    "servicequotaexceededexception",
+    "serviceunavailableexception",
+}
+
+
+class RateLimitTimeout(Exception):
+    """The limiter couldn't start a call within its `acquire_timeout`.  The service is busy, try again later."""
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Whether the error is Bedrock or Pinecone telling us to slow down."""
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        return code.lower() in _THROTTLING_ERROR_CODES
+
+    # Pinecone's `PineconeApiException` carries the HTTP status
+    return getattr(error, "status", None) == 429
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self._rate = rate
+
+    def take(self, timeout: float | None = None) -> bool:
+        """Blocks until a token is available, or returns False if none was within `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self._rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._last_refill) * self._rate
+        )
+        self._last_refill = now
+
+
+class RateLimiter:
+    """
+    Client-side limiter for a single service.
+
+    Calls are paced by a token bucket and capped by a maximum concurrency.  The bucket's rate adapts with AIMD: every
+    throttling response halves it (down to `min_rate`), and every success adds `additive_increase` back (up to `rate`).
+    Throttled calls are retried with exponential backoff and full jitter.  A `rate` or `max_concurrency` of `None`
+    means unlimited.  A call that can't get a slot and a token within `acquire_timeout` seconds raises
+    `RateLimitTimeout` instead of waiting on, so callers can shed load; `None` waits as long as it takes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float | None = None,
+        burst: float | None = None,
+        max_concurrency: int | None = None,
+        acquire_timeout: float | None = None,
+        min_rate: float = 0.1,
+        additive_increase: float = 0.1,
+        decrease_factor: float = 0.5,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+    ):
+        self._name = name
+        self._max_rate = rate
+        self._min_rate = min_rate
+        self._additive_increase = additive_increase
+        self._decrease_factor = decrease_factor
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_concurrency = max_concurrency
+        self._acquire_timeout = acquire_timeout
+
+        self._bucket = (
+            TokenBucket(rate, burst if burst is not None else rate)
+            if rate is not None
+            else None
+        )
+        self._semaphore = (
+            threading.BoundedSemaphore(max_concurrency)
+            if max_concurrency is not None
+            else None
+        )
+
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self._throttles = 0
+        self._retries = 0
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._acquire_timeouts = 0
+
+    def call(self, function: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            with self._acquire():
+                try:
+                    result = function()
+                except Exception as e:
+                    if not self._should_retry(e, attempt):
+                        raise
+                else:
+                    self._record_success()
+                    return result
+
+            self._backoff(attempt)
+            attempt += 1
+
+    def stream(self, function: Callable[[], Iterator[Any]]):
+        """
+        Like `call`, but for a function that returns an iterator.  Only failures before the first item are retried,
+        because after that the caller has already seen part of the stream.  The concurrency slot is held until the
+        stream is exhausted or closed.
+        """
+        attempt = 0
+        while True:
+            with self._acquire():
+                iterator = None
+                try:
+                    iterator = iter(function())
+                    first = next(iterator)
+                except StopIteration:
+                    self._record_success()
+                    return
+                except Exception as e:
+                    if hasattr(iterator, "close"):
+                        iterator.close()
+                    if not self._should_retry(e, attempt):
+                        raise
+                else:
+                    self._record_success()
+                    yield first
+                    yield from iterator
+                    return
+
+            self._backoff(attempt)
+            attempt += 1
+
+    @property
+    def max_concurrency(self) -> int | None:
+        return self._max_concurrency
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "attempts": self._attempts,
+                "throttles": self._throttles,
+                "retries": self._retries,
+                "throttle_rate": self._throttles / self._attempts
+                if self._attempts
+                else 0.0,
+                "mean_queue_wait": self._total_queue_wait / self._attempts
+                if self._attempts
+                else 0.0,
+                "max_queue_wait": self._max_queue_wait,
+                "acquire_timeouts": self._acquire_timeouts,
+                "rate": self._bucket.rate if self._bucket is not None else float("inf"),
+            }
+
+    @contextlib.contextmanager
+    def _acquire(self):
+        start = time.perf_counter()
+        timeout = self._acquire_timeout
+        if self._semaphore is not None:
+            if not self._semaphore.acquire(timeout=timeout):
+                self._raise_acquire_timeout()
+        try:
+            if self._bucket is not None:
+                remaining = (
+                    None
+                    if timeout is None
+                    else max(0.0, timeout - (time.perf_counter() - start))
+                )
+                if not self._bucket.take(timeout=remaining):
+                    self._raise_acquire_timeout()
+
+            queue_wait = time.perf_counter() - start
+            with self._lock:
+                self._attempts += 1
+                self._total_queue_wait += queue_wait
+                self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def _raise_acquire_timeout(self):
+        with self._lock:
+            self._acquire_timeouts += 1
+        raise RateLimitTimeout(
+            f"{self._name} is busy, no call could start within {self._acquire_timeout} seconds"
+        )
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        if not is_throttling_error(error):
+            return False
+
+        with self._lock:
+            self._throttles += 1
+            if self._bucket is not None:
+                self._bucket.set_rate(
+                    max(self._min_rate, self._bucket.rate * self._decrease_factor)
+                )
+                logging.warning(
+                    f"{self._name} throttled, rate lowered to {self._bucket.rate:.2f}/s"
+                )
+
+            if attempt >= self._max_retries:
+                return False
+
+            self._retries += 1
+            return True
+
+    def _record_success(self):
+        if self._bucket is None:
+            return
+
+        with self._lock:
+            self._bucket.set_rate(
+                min(self._max_rate, self._bucket.rate + self._additive_increase)
+            )
+
+    def _backoff(self, attempt: int):
+        delay = random.uniform(0, min(self._max_delay, self._base_delay * 2**attempt))
+        time.sleep(delay)
+
+
+# Per-service defaults, deliberately below the default Bedrock and Pinecone quotas.  Bedrock quotas are per model, so
+# each model gets its own limiter named `bedrock:{model name}`.
+DEFAULT_LIMITS: dict[str, dict[str, Any]] = {
+    "bedrock": {
+        "rate": 2.0,
+        "burst": 4.0,
+        "max_concurrency": 8,
+        "acquire_timeout": 30.0,
+    },
+    "pinecone": {
+        "rate": 20.0,
+        "burst": 20.0,
+        "max_concurrency": 16,
+        "acquire_timeout": 10.0,
+    },
+}
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """The process-wide limiter for `name`, created with the defaults of its service (the part before any `:`)."""
+    with _limiters_lock:
+        if name not in _limiters:
+            service = name.split(":")[0]
+            _limiters[name] = RateLimiter(name, **DEFAULT_LIMITS.get(service, {}))
+        return _limiters[name]
+
+
+def all_metrics() -> dict[str, dict[str, float]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.metrics() for name, limiter in limiters.items()}
@@ -0,0 +1,208 @@
+import logging
+import re
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from llm import Llm
+from questions import is_broad_question
+
+SMALL_MODEL_NAME = "us.meta.llama3-1-8b-instruct-v1:0"
+
+# questions that need reasoning over several entries rather than a lookup
+_REASONING_QUESTION_RE = re.compile(
+    r"\b(compare|trend\w*|why|how)\b",
+    re.IGNORECASE,
+)
+# how the assistant opens an answer when the entries don't have one, e.g. "I couldn't find ..." but not "You were
+# unable to finish the migration"
+_NON_ANSWER_RE = re.compile(
+    r"^\W*(?:"
+    r"i (?:don't|do not) (?:know|have|see)"
+    r"|i (?:can't|cannot|couldn't|could not|was unable to|am unable to) (?:find|answer|tell|determine)"
+    r"|i'm (?:not sure|unable to)"
+    r"|(?:there (?:are|is) )?no (?:diary )?entr(?:y|ies) (?:that |which )?(?:mention|match|cover|say)"
+    r"|(?:the )?(?:diary )?entries (?:don't|do not) (?:mention|say|contain|include)"
+    r")",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RouteDecision:
+    use_large: bool
+    reasons: list[str] = field(default_factory=list)
+
+
+class QueryRouter:
+    """
+    Decides whether a query can be answered by the small model, using only signals that are free to compute: the
+    question's wording, how many hits came back, how spread out their scores are, and how much context there is.
+    """
+
+    def __init__(
+        self,
+        max_small_hits: int = 10,
+        min_score_spread: float = 0.15,
+        max_small_context_characters: int = 3000,
+    ):
+        self._max_small_hits = max_small_hits
+        self._min_score_spread = min_score_spread
+        self._max_small_context_characters = max_small_context_characters
+
+    def route(self, query: str, context: list[dict[str, Any]]) -> RouteDecision:
+        reasons = []
+
+        if is_broad_question(query):
+            reasons.append("broad question")
+        elif _REASONING_QUESTION_RE.search(query):
+            reasons.append("reasoning question")
+
+        if len(context) > self._max_small_hits:
+            scores = [hit["_score"] for hit in context if "_score" in hit]
+            # many hits are fine when a few clearly stand out, not when they're all about as relevant
+            if (
+                len(scores) < 2
+                or max(scores) - statistics.median(scores) < self._min_score_spread
+            ):
+                reasons.append(f"{len(context)} similarly relevant hits")
+
+        context_characters = sum(
+            len(hit.get("fields", {}).get("text", "")) for hit in context
+        )
+        if context_characters > self._max_small_context_characters:
+            reasons.append(f"{context_characters} characters of context")
+
+        return RouteDecision(use_large=bool(reasons), reasons=reasons)
+
+
+def passes_answer_check(answer: str, context: list[dict[str, Any]]) -> bool:
+    """A cheap sanity check of the small model's answer: non-empty, not a non-answer, and citing a diary file."""
+    answer = answer.strip()
+    if len(answer) < 20:
+        return False
+    if not passes_prefix_check(answer):
+        return False
+    # the system prompt asks for the filename of every entry used
+    if context and ".md" not in answer:
+        return False
+    return True
+
+
+def passes_prefix_check(prefix: str) -> bool:
+    """The part of `passes_answer_check` that the start of an answer is enough for: it doesn't open with a non-answer."""
+    return not _NON_ANSWER_RE.match(prefix)
+
+
+class RoutingLlm:
+    """
+    Has the same `stream` interface as `Llm`, but sends each query to either a small, fast model or a large model.
+
+    With `escalate` on, the first `check_characters` of the small model's answer are held back and checked with
+    `passes_prefix_check`, or the whole answer with `passes_answer_check` if it's that short, and the query is
+    escalated to the large model when the check fails.  Once the check passes, the rest of the answer streams as it
+    comes, so escalation only delays the first token by the time to generate the prefix.
+    """
+
+    def __init__(
+        self,
+        small: Llm,
+        large: Llm,
+        router: QueryRouter | None = None,
+        escalate: bool = True,
+        check_characters: int = 200,
+    ):
+        self._small = small
+        self._large = large
+        self._router = router or QueryRouter()
+        self._escalate = escalate
+        self._check_characters = check_characters
+
+        self._lock = threading.Lock()
+        # moving averages of the large model's latency and time to first token, to estimate the time saved
+        self._large_seconds: float | None = None
+        self._large_first_token_seconds: float | None = None
+
+    def stream(self, query: str, context: list[dict[str, Any]]):
+        decision = self._router.route(query, context)
+
+        if decision.use_large:
+            logging.info(f"Routing to large model: {', '.join(decision.reasons)}")
+            yield from self._stream_large(query, context)
+            return
+
+        logging.info("Routing to small model")
+        start = time.perf_counter()
+        first_token_seconds = None
+
+        chunks = iter(self._small.stream(query, context))
+        if not self._escalate:
+            for chunk in chunks:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                yield chunk
+            self._log_savings(time.perf_counter() - start, first_token_seconds)
+            return
+
+        prefix = ""
+        finished = True
+        for chunk in chunks:
+            prefix += chunk
+            if len(prefix) >= self._check_characters:
+                finished = False
+                break
+
+        if finished:
+            passed = passes_answer_check(prefix, context)
+        else:
+            passed = passes_prefix_check(prefix)
+
+        if not passed:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            logging.info(
+                f"Small model answer failed the check after {time.perf_counter() - start:.2f}s, escalating to large model"
+            )
+            yield from self._stream_large(query, context)
+            return
+
+        first_token_seconds = time.perf_counter() - start
+        yield prefix
+        yield from chunks
+        self._log_savings(time.perf_counter() - start, first_token_seconds)
+
+    def _stream_large(self, query: str, context: list[dict[str, Any]]):
+        start = time.perf_counter()
+        first_token_seconds = None
+        for chunk in self._large.stream(query, context):
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            yield chunk
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._large_seconds = _moving_average(self._large_seconds, elapsed)
+            if first_token_seconds is not None:
+                self._large_first_token_seconds = _moving_average(
+                    self._large_first_token_seconds, first_token_seconds
+                )
+
+    def _log_savings(self, small_seconds: float, first_token_seconds: float | None):
+        with self._lock:
+            large_seconds = self._large_seconds
+            large_first_token_seconds = self._large_first_token_seconds
+
+        message = f"Small model answered in {small_seconds:.2f}s"
+        if first_token_seconds is not None:
+            message += f", first token after {first_token_seconds:.2f}s"
+        if large_seconds is not None:
+            message += f", saving about {large_seconds - small_seconds:.2f}s"
+        if first_token_seconds is not None and large_first_token_seconds is not None:
+            message += f" and {large_first_token_seconds - first_token_seconds:.2f}s to first token"
+        logging.info(message)
+
+
+def _moving_average(average: float | None, value: float) -> float:
+    return value if average is None else 0.8 * average + 0.2 * value
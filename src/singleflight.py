@@ -0,0 +1,148 @@
+import copy
+import logging
+import threading
+from typing import Any, Callable, Hashable, Iterator
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class _Stream:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.chunks: list[Any] = []
+        self.done = False
+        self.cancelled = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+
+
+class SingleFlight:
+    """
+    Joins concurrent identical calls into one in-flight call.
+
+    `do` is for calls that return a value (e.g. retrieval) and `stream` is for calls that return an iterator (e.g.
+    generation).  Callers that arrive while a call with the same key is in flight share its result instead of making
+    their own call.  Once a call finishes, the next caller with that key starts a fresh call; nothing is cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._streams: dict[Hashable, _Stream] = {}
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            logging.info(f"Joining in-flight call for {key!r}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # each waiter gets its own copy so nobody can mutate someone else's result
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key: Hashable, function: Callable[[], Iterator[Any]]):
+        """
+        Every subscriber gets all the chunks of the shared stream, including those produced before it joined, as they
+        arrive.  The underlying iterator is closed early once the last subscriber stops iterating.
+        """
+        # joining happens on the first `next`, so every subscriber that joins is guaranteed to reach the `finally`
+        with self._lock:
+            shared_stream = self._streams.get(key)
+            leader = shared_stream is None
+            if leader:
+                shared_stream = _Stream()
+                self._streams[key] = shared_stream
+            shared_stream.subscribers += 1
+
+        try:
+            if leader:
+                threading.Thread(
+                    target=self._produce,
+                    args=(key, shared_stream, function),
+                    name=f"single-flight-{key!r}",
+                    daemon=True,
+                ).start()
+            else:
+                logging.info(f"Joining in-flight stream for {key!r}")
+
+            position = 0
+            while True:
+                with shared_stream.condition:
+                    while (
+                        position >= len(shared_stream.chunks) and not shared_stream.done
+                    ):
+                        shared_stream.condition.wait()
+
+                    if position < len(shared_stream.chunks):
+                        chunk = shared_stream.chunks[position]
+                    elif shared_stream.error is not None:
+                        raise shared_stream.error
+                    else:
+                        return
+
+                position += 1
+                yield chunk
+        finally:
+            self._leave(key, shared_stream)
+
+    def _produce(
+        self, key: Hashable, shared_stream: _Stream, function: Callable[[], Iterator]
+    ):
+        iterator = None
+        try:
+            iterator = iter(function())
+            for chunk in iterator:
+                with shared_stream.condition:
+                    if shared_stream.cancelled:
+                        logging.info(f"All subscribers left, cancelling {key!r}")
+                        break
+                    shared_stream.chunks.append(chunk)
+                    shared_stream.condition.notify_all()
+        except BaseException as e:
+            shared_stream.error = e
+        finally:
+            if iterator is not None and hasattr(iterator, "close"):
+                iterator.close()
+            self._forget_stream(key, shared_stream)
+            with shared_stream.condition:
+                shared_stream.done = True
+                shared_stream.condition.notify_all()
+
+    def _leave(self, key: Hashable, shared_stream: _Stream):
+        with self._lock:
+            shared_stream.subscribers -= 1
+            if shared_stream.subscribers > 0:
+                return
+            # a stream nobody is listening to anymore must not be joined by new callers
+            if self._streams.get(key) is shared_stream:
+                del self._streams[key]
+
+        with shared_stream.condition:
+            shared_stream.cancelled = True
+
+    def _forget_stream(self, key: Hashable, shared_stream: _Stream):
+        with self._lock:
+            if self._streams.get(key) is shared_stream:
+                del self._streams[key]
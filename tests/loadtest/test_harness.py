@@ -0,0 +1,99 @@
+import pytest
+
+from llm import Llm
+from loadtest.harness import LoadTest, percentile
+from loadtest.stubs import Latency, StubChatModel, StubIndex, Throttle
+from rag.database import Database
+from ratelimit import RateLimiter
+
+
+class TestLoadTest:
+    """Test suite for the load test harness and the local stand-ins."""
+
+    @pytest.fixture
+    def documents(self):
+        """Sample diary documents for the stub index."""
+        return [
+            {"text": "- Had team standup", "filename": "week1.md", "Category": "Notes"},
+            {"text": "- Sprint planning", "filename": "week1.md", "Category": "Notes"},
+            {"text": "- [x] Ship feature", "filename": "week2.md", "Category": "Goals"},
+        ]
+
+    @pytest.fixture
+    def limiter(self):
+        """An unlimited rate limiter that doesn't retry, so throttling shows up immediately."""
+        return RateLimiter("test", max_retries=0)
+
+    def test_run_reports_every_session(self, documents, limiter):
+        """Test that a run reports all sessions with no errors and a time to first token."""
+        database = Database(StubIndex(documents), limiter)
+        llm = Llm(chat_model=StubChatModel(response_tokens=5), limiter=limiter)
+        load_test = LoadTest(database, llm, ["What happened at standup?"])
+
+        report = load_test.run(concurrency=4, sessions=10)
+
+        assert report.sessions == 10
+        assert report.errors == 0
+        assert report.throughput > 0
+        assert 0 < report.first_token_p50 <= report.latency_p50
+
+    def test_run_counts_throttled_sessions_as_errors(self, documents, limiter):
+        """Test that throttling errors from the stand-ins are counted, not raised."""
+        database = Database(
+            StubIndex(documents, throttle=Throttle(throttle_rate=1.0)), limiter
+        )
+        llm = Llm(chat_model=StubChatModel(response_tokens=5), limiter=limiter)
+        load_test = LoadTest(database, llm, ["What happened at standup?"])
+
+        report = load_test.run(concurrency=2, sessions=4)
+
+        assert report.errors == 4
+        assert report.throughput == 0
+
+    def test_sweep_yields_one_report_per_level(self, documents, limiter):
+        """Test that a sweep produces a report for each concurrency level."""
+        database = Database(StubIndex(documents), limiter)
+        llm = Llm(chat_model=StubChatModel(response_tokens=2), limiter=limiter)
+        load_test = LoadTest(database, llm, ["standup", "planning"])
+
+        reports = list(load_test.sweep([1, 2, 4], sessions_per_level=4))
+
+        assert [report.concurrency for report in reports] == [1, 2, 4]
+
+    def test_stub_index_search_returns_best_overlap_first(self, documents):
+        """Test that the stub index ranks hits by word overlap and honours top_n."""
+        index = StubIndex(documents)
+
+        results = index.search(
+            namespace="diary",
+            query={"top_k": 20, "inputs": {"text": "sprint planning"}},
+            rerank={"top_n": 2},
+        )
+
+        hits = results["result"]["hits"]
+        assert len(hits) == 2
+        assert hits[0]["fields"]["text"] == "- Sprint planning"
+
+    def test_stub_chat_model_streams_configured_tokens(self):
+        """Test that the stub chat model streams the configured number of tokens."""
+        chat_model = StubChatModel(response_tokens=3, token_latency=Latency(0.001))
+
+        chunks = [chunk.content for chunk in chat_model.stream("hello")]
+
+        assert chunks == ["token0 ", "token1 ", "token2 "]
+
+    def test_requests_per_second_throttle(self):
+        """Test that calls beyond the requests-per-second quota are throttled."""
+        throttle = Throttle(requests_per_second=2)
+
+        decisions = [throttle.should_throttle() for _ in range(3)]
+
+        assert decisions == [False, False, True]
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile helper."""
+        values = [float(value) for value in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
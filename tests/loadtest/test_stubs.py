@@ -0,0 +1,23 @@
+from pinecone.core.openapi.db_data.models import Hit, SearchRecordsResponse
+
+from loadtest.stubs import StubIndex
+
+
+class TestStubIndex:
+    """Test suite for StubIndex class."""
+
+    def test_search_returns_pinecone_models(self):
+        """Test that search returns the same response types the real index does."""
+        index = StubIndex([{"_id": "a", "text": "shipped search"}])
+
+        response = index.search(
+            namespace="diary",
+            query={"top_k": 5, "inputs": {"text": "search"}},
+            rerank={"top_n": 5},
+        )
+
+        assert isinstance(response, SearchRecordsResponse)
+        [hit] = response["result"]["hits"]
+        assert isinstance(hit, Hit)
+        assert hit["_id"] == "a"
+        assert hit["fields"] == {"text": "shipped search"}
@@ -0,0 +1,126 @@
+import pytest
+
+from loadtest.stubs import StubIndex
+from rag.database import Database
+from rag.summarizer import MONTH_SUMMARY, WEEK_SUMMARY, summary_id
+from ratelimit import RateLimiter
+
+
+class TestDatabase:
+    """Test suite for Database class against the local index stand-in."""
+
+    @pytest.fixture
+    def database(self):
+        """A Database with raw entries and summaries."""
+        index = StubIndex(
+            [
+                {
+                    "_id": "entry-1",
+                    "text": "- Shipped search in 2024",
+                    "filename": "a.md",
+                },
+                {"_id": "entry-2", "text": "- Planned billing", "filename": "b.md"},
+                {
+                    "_id": "summary-week",
+                    "text": "In 2024 the search project shipped",
+                    "filename": "a.md",
+                    "Record Type": WEEK_SUMMARY,
+                    "Source Hash": "abc",
+                },
+                {
+                    "_id": "summary-month",
+                    "text": "January 2024 was about search",
+                    "filename": "a.md",
+                    "Record Type": MONTH_SUMMARY,
+                    "Source Hash": "def",
+                },
+            ]
+        )
+        return Database(index, RateLimiter("test"))
+
+    def test_specific_question_only_searches_entries(self, database):
+        """Test that a specific question never returns summaries."""
+        hits = database.retrieve_documents("When did I plan billing?")
+
+        assert {hit["_id"] for hit in hits} == {"entry-1", "entry-2"}
+
+    def test_broad_question_searches_summaries_first(self, database):
+        """Test that a broad question returns summaries ahead of raw entries."""
+        hits = database.retrieve_documents("What did I accomplish in 2024?")
+
+        assert [hit["fields"].get("Record Type") for hit in hits[:2]] == [
+            WEEK_SUMMARY,
+            MONTH_SUMMARY,
+        ]
+        assert {hit["_id"] for hit in hits[2:]} == {"entry-1", "entry-2"}
+
+    def test_broad_question_without_summaries_falls_back(self):
+        """Test that a broad question still gets entries when there is no summary tier."""
+        database = Database(
+            StubIndex(
+                [{"_id": "entry-1", "text": "- Shipped search", "filename": "a"}]
+            ),
+            RateLimiter("test"),
+        )
+
+        hits = database.retrieve_documents("Summarize my year")
+
+        assert [hit["_id"] for hit in hits] == ["entry-1"]
+
+    def test_fetch_metadata(self, database):
+        """Test that metadata is fetched by ID and missing IDs are skipped."""
+        metadata = database.fetch_metadata(["summary-week", "missing"])
+
+        assert list(metadata) == ["summary-week"]
+        assert metadata["summary-week"]["Source Hash"] == "abc"
+
+    def test_add_documents_keeps_given_ids(self, database):
+        """Test that documents with an _id keep it, and others get a generated one."""
+        database.add_documents(
+            [
+                {"_id": "summary-week", "text": "new", "Source Hash": "xyz"},
+                {"text": "x"},
+            ]
+        )
+
+        assert (
+            database.fetch_metadata(["summary-week"])["summary-week"]["text"] == "new"
+        )
+        assert not database.fetch_metadata(["summary-week"])["summary-week"].get("_id")
+
+    def test_has_data_ignores_summaries(self):
+        """Test that an index holding only summaries doesn't count as loaded."""
+        index = StubIndex(
+            [
+                {
+                    "_id": summary_id(WEEK_SUMMARY, "a.md"),
+                    "text": "A week",
+                    "Record Type": WEEK_SUMMARY,
+                }
+            ]
+        )
+        database = Database(index, RateLimiter("test"))
+
+        assert not database.has_data()
+
+        database.add_documents([{"text": "- Shipped search", "filename": "a.md"}])
+
+        assert database.has_data()
+
+    def test_has_data_empty(self):
+        """Test that an empty index has no data."""
+        assert not Database(StubIndex(), RateLimiter("test")).has_data()
+
+    def test_delete_ids(self):
+        """Test that deleted records are gone and others are kept."""
+        index = StubIndex(
+            [
+                {"_id": "a", "text": "- Shipped search", "filename": "a.md"},
+                {"_id": "b", "text": "- Planned billing", "filename": "a.md"},
+            ]
+        )
+        database = Database(index, RateLimiter("test"))
+
+        database.delete_ids(["a", "missing"])
+
+        assert [ids for ids in database.list_ids()] == [["b"]]
@@ -0,0 +1,151 @@
+import pytest
+
+from rag.dedup import NearDuplicateDetector
+
+
+class TestNearDuplicateDetector:
+    """Test suite for NearDuplicateDetector class."""
+
+    @pytest.fixture
+    def detector(self):
+        """Create a NearDuplicateDetector."""
+        return NearDuplicateDetector()
+
+    @pytest.fixture
+    def documents(self):
+        """Diary entries with a recurring standup."""
+        return [
+            {
+                "text": "- Team standup about the release plan and blockers.",
+                "filename": "2024-01 (week 3).md",
+                "Category": "Notes",
+                "Day of Week": "Monday",
+            },
+            {
+                "text": "- Migrated the billing service to the new database.",
+                "filename": "2024-01 (week 3).md",
+                "Category": "Notes",
+                "Day of Week": "Tuesday",
+            },
+            {
+                "text": "- Team standup about the release plan and blockers!",
+                "filename": "2024-02 (week 7).md",
+                "Category": "Notes",
+                "Day of Week": "Monday",
+            },
+            {
+                "text": "- team standup: about the release plan and blockers",
+                "filename": "2024-03 (week 11).md",
+                "Category": "Notes",
+            },
+        ]
+
+    def test_cluster_groups_near_duplicates(self, detector, documents):
+        """Test that near-identical entries end up in one cluster."""
+        assert detector.cluster(documents) == [[0, 2, 3], [1]]
+
+    def test_deduplicate_keeps_one_representative(self, detector, documents):
+        """Test that each cluster becomes its first entry with occurrence metadata."""
+        result = detector.deduplicate(documents)
+
+        assert len(result) == 2
+        standup = result[0]
+        assert standup["text"] == documents[0]["text"]
+        assert standup["Occurrence Count"] == 3
+        assert standup["Occurrences"] == [
+            "2024-01 (week 3).md, Monday",
+            "2024-02 (week 7).md, Monday",
+            "2024-03 (week 11).md",
+        ]
+        assert standup["First Occurrence"] == "2024-01 (week 3).md, Monday"
+        assert standup["Last Occurrence"] == "2024-03 (week 11).md"
+
+    def test_unique_entries_are_untouched(self, detector, documents):
+        """Test that entries without duplicates get no occurrence metadata."""
+        result = detector.deduplicate(documents)
+
+        assert result[1] == documents[1]
+
+    def test_different_categories_are_not_merged(self, detector):
+        """Test that the same text in different categories stays separate."""
+        documents = [
+            {
+                "text": "- [ ] Ship the new search",
+                "filename": "a.md",
+                "Category": "Goals",
+            },
+            {"text": "- Ship the new search", "filename": "a.md", "Category": "Notes"},
+        ]
+
+        assert detector.cluster(documents) == [[0], [1]]
+
+    def test_checkbox_state_is_kept(self, detector):
+        """Test that an open to do and the same to do once done aren't merged."""
+        documents = [
+            {"text": "- [ ] Ship the new search", "filename": "a.md"},
+            {"text": "- [x] Ship the new search", "filename": "b.md"},
+            {"text": "- [X] Ship the new search", "filename": "c.md"},
+        ]
+
+        assert detector.cluster(documents) == [[0], [1, 2]]
+
+    def test_list_markup_is_ignored(self, detector):
+        """Test that list markers don't count towards similarity."""
+        documents = [
+            {"text": "- Ship the new search", "filename": "a.md"},
+            {"text": "Ship the new search", "filename": "b.md"},
+        ]
+
+        assert detector.cluster(documents) == [[0, 1]]
+
+    def test_deduplicate_keeps_differing_texts(self, detector, documents):
+        """Test that texts of a cluster that differ from the representative's are kept."""
+        result = detector.deduplicate(documents)
+
+        assert result[0]["Variants"] == [documents[2]["text"], documents[3]["text"]]
+
+    def test_recurring_entry_metadata_is_capped(self):
+        """Test that an entry recurring across years keeps a bounded amount of metadata."""
+        documents = [
+            {
+                "text": f"- Daily standup about the release plan{'!' * (number % 5)}",
+                "filename": f"{2020 + number // 52}-week {number % 52:02}.md",
+                "Category": "Notes",
+            }
+            for number in reversed(range(1000))
+        ]
+
+        result = NearDuplicateDetector(
+            max_listed_occurrences=5, max_variants=2
+        ).deduplicate(documents)
+
+        assert len(result) == 1
+        assert result[0]["Occurrence Count"] == 1000
+        assert result[0]["First Occurrence"] == "2020-week 00.md"
+        assert result[0]["Last Occurrence"] == "2039-week 11.md"
+        assert len(result[0]["Occurrences"]) == 5
+        assert len(result[0]["Variants"]) == 2
+
+    def test_different_facts_are_not_merged(self, detector):
+        """Test that entries differing in what they are about stay separate."""
+        documents = [
+            {
+                "text": "- Implemented feature flags for gradual rollout of new functionality.",
+                "filename": "a.md",
+            },
+            {
+                "text": "- Implemented feature flags for gradual rollout of new AI features.",
+                "filename": "b.md",
+            },
+        ]
+
+        assert detector.cluster(documents) == [[0], [1]]
+
+    def test_empty_input(self, detector):
+        """Test that no documents produce no clusters."""
+        assert detector.deduplicate([]) == []
+
+    def test_invalid_band_configuration(self):
+        """Test that permutations must divide evenly into bands."""
+        with pytest.raises(ValueError):
+            NearDuplicateDetector(num_permutations=100, bands=32)
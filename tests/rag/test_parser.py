@@ -1,9 +1,11 @@
+import random
+
 import pytest
 from pathlib import Path
 import tempfile
 import shutil
 
-from rag.parser import DiaryParser
+from rag.parser import DiaryParser, parse_diary_text, reparse_diary_text
 
 
 class TestDiaryParser:
@@ -222,3 +224,169 @@ Regular text here too
 
         assert "Goals" in categories
         assert "Monday" in days
+
+    def test_parse_last_item_keeps_its_own_section(self, parser_with_data):
+        """Test that the last item before a header isn't given the next section's metadata."""
+        result = parser_with_data.parse()
+
+        by_text = {doc["text"]: doc for doc in result}
+        assert by_text["- [x] Review code changes"]["Category"] == "Goals"
+        assert by_text["- Started implementation"]["Day of Week"] == "Monday"
+        assert by_text["- Updated dependencies"]["Day of Week"] == "Tuesday"
+        assert "Day of Week" not in by_text["- Update README file"]
+
+    def test_parse_checkbox_status(self, parser_with_data):
+        """Test that checkbox items get their status and other items don't."""
+        result = parser_with_data.parse()
+
+        by_text = {doc["text"]: doc for doc in result}
+        assert by_text["- [ ] Complete project documentation"]["Status"] == "Open"
+        assert by_text["- [x] Review code changes"]["Status"] == "Done"
+        assert "Status" not in by_text["- Had team meeting"]
+
+    def test_parse_offsets_point_at_the_source(
+        self, parser_with_data, sample_diary_content
+    ):
+        """Test that every document's offsets span exactly its text in the file."""
+        result = parser_with_data.parse()
+
+        for doc in result:
+            assert (
+                sample_diary_content[doc["Start Offset"] : doc["End Offset"]]
+                == doc["text"]
+            )
+
+    def test_parse_continuation_lines(self, temp_dir):
+        """Test that lines that aren't items or headers continue the current item."""
+        content = """# Notes
+  Intro without a bullet
+- First item
+  continued here
+
+  and after a blank line
+- Second item
+"""
+
+        (temp_dir / "continued.md").write_text(content)
+        result = DiaryParser(temp_dir).parse()
+
+        assert [doc["text"] for doc in result] == [
+            "Intro without a bullet",
+            "- First item\n  continued here\n\n  and after a blank line",
+            "- Second item",
+        ]
+
+    def test_parse_ignores_blank_lines_outside_items(self, temp_dir):
+        """Test that blank lines don't become empty documents."""
+        (temp_dir / "blank.md").write_text("\n\n# Goals\n\n- Item\n\n")
+
+        result = DiaryParser(temp_dir).parse()
+
+        assert [doc["text"] for doc in result] == ["- Item"]
+
+
+class TestReparseDiaryText:
+    """Test suite for incremental reparsing of edited diary files."""
+
+    @pytest.fixture
+    def text(self):
+        """A diary file with several sections."""
+        return """# Goals
+- [ ] Ship search
+- [x] Plan billing
+# Notes
+## Monday
+- Standup
+  about the release
+- Fixed a bug
+## Tuesday
+- Reviewed code
+- Wrote docs
+"""
+
+    @pytest.mark.parametrize(
+        "old, new",
+        [
+            ("- [ ] Ship search", "- [x] Ship search"),
+            ("  about the release", "  about the release\n  and blockers"),
+            ("- Fixed a bug\n", ""),
+            ("## Tuesday", "## Wednesday"),
+            ("# Notes", "# Journal"),
+            ("- Wrote docs\n", "- Wrote docs\n- Deployed\n"),
+            ("# Goals\n", ""),
+            ("- Reviewed code", "# Tasks\n- Reviewed code"),
+        ],
+    )
+    def test_reparse_matches_a_full_parse(self, text, old, new):
+        """Test that reparsing an edit gives the same result as parsing the edited file from scratch."""
+        edited = text.replace(old, new)
+
+        reparsed = reparse_diary_text(parse_diary_text("a.md", text), edited)
+
+        assert reparsed == parse_diary_text("a.md", edited)
+
+    def test_reparse_shifts_entries_after_the_edit(self, text):
+        """Test that entries after the edit are reused with their offsets shifted."""
+        edited = text.replace("- Standup", "- Standup meeting")
+
+        documents = reparse_diary_text(
+            parse_diary_text("a.md", text), edited
+        ).documents()
+
+        wrote_docs = next(doc for doc in documents if doc["text"] == "- Wrote docs")
+        assert wrote_docs["Start Offset"] == edited.index("- Wrote docs")
+        assert wrote_docs["Day of Week"] == "Tuesday"
+
+    def test_reparse_unchanged_text(self, text):
+        """Test that reparsing the same text returns the same entries."""
+        parsed = parse_diary_text("a.md", text)
+
+        assert reparse_diary_text(parsed, text) == parsed
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_reparse_matches_a_full_parse_for_random_edits(self, seed):
+        """Test that reparsing random line and character edits of random files matches parsing them from scratch."""
+        lines = [
+            "# Goals",
+            "## Monday",
+            "- [ ] a",
+            "- [x] b",
+            "  cont",
+            "",
+            "  ",
+            "text",
+            "- c",
+            "# Notes",
+            "## Tue",
+            "- d",
+            "- ",
+            "-x",
+            "#",
+            "#x",
+            "- c  ",
+        ]
+        generator = random.Random(seed)
+
+        for _ in range(50):
+            old_lines = generator.choices(lines, k=generator.randint(0, 12))
+            new_lines = list(old_lines)
+            for _ in range(generator.randint(1, 3)):
+                edit = generator.choice(["insert", "delete", "replace"])
+                position = generator.randint(0, len(new_lines))
+                if edit == "insert" or not new_lines:
+                    new_lines.insert(position, generator.choice(lines))
+                elif edit == "delete":
+                    del new_lines[min(position, len(new_lines) - 1)]
+                else:
+                    new_lines[min(position, len(new_lines) - 1)] = generator.choice(
+                        lines
+                    )
+            old = "\n".join(old_lines) + generator.choice(["", "\n"])
+            new = "\n".join(new_lines) + generator.choice(["", "\n"])
+            if generator.random() < 0.5:
+                position = generator.randint(0, len(new))
+                new = new[:position] + generator.choice("-# x[]\n") + new[position:]
+
+            reparsed = reparse_diary_text(parse_diary_text("a.md", old), new)
+
+            assert reparsed == parse_diary_text("a.md", new), (old, new)
@@ -0,0 +1,132 @@
+import gzip
+
+import pytest
+
+from loadtest.stubs import StubIndex
+from rag.database import Database
+from rag.snapshot import NamespaceSnapshot
+from ratelimit import RateLimiter
+
+
+class TestNamespaceSnapshot:
+    """Test suite for NamespaceSnapshot class."""
+
+    @pytest.fixture
+    def source(self):
+        """A Database with more records than fit in one list page."""
+        index = StubIndex(
+            [
+                {
+                    "_id": f"entry-{number:03}",
+                    "text": f"- Entry {number}",
+                    "filename": "a.md",
+                }
+                for number in range(250)
+            ]
+        )
+        return Database(index, RateLimiter("test"))
+
+    @pytest.fixture
+    def snapshot(self, tmp_path):
+        """A NamespaceSnapshot in a temporary directory."""
+        return NamespaceSnapshot(
+            tmp_path / "snapshots" / "diary.jsonl.gz", max_workers=4
+        )
+
+    def test_export_writes_chunks_per_page(self, source, snapshot):
+        """Test that every record is exported, one chunk per list page."""
+        assert snapshot.export(source) == 250
+
+        chunks = list(snapshot.chunks())
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+        assert chunks[0][0]["id"] == "entry-000"
+        assert chunks[2][-1]["metadata"]["text"] == "- Entry 249"
+
+    def test_round_trip_keeps_vectors_and_metadata(self, source, snapshot):
+        """Test that a restored namespace has the same embeddings and metadata as the exported one."""
+        snapshot.export(source)
+        target = Database(StubIndex(), RateLimiter("test"))
+
+        assert snapshot.restore(target) == 250
+
+        ids = [f"entry-{number:03}" for number in range(250)]
+        assert sorted(target.fetch_vectors(ids), key=lambda v: v["id"]) == sorted(
+            source.fetch_vectors(ids), key=lambda v: v["id"]
+        )
+
+    def test_restored_embeddings_are_not_recomputed(self, tmp_path):
+        """Test that restore upserts the snapshot's embeddings as they are."""
+        path = tmp_path / "diary.jsonl.gz"
+        with gzip.open(path, "wt") as snapshot_file:
+            snapshot_file.write('{"format": "diary-snapshot", "version": 2}\n')
+            snapshot_file.write(
+                '[{"id": "a", "values": [0.5, 0.25], "metadata": {"text": "x"}}]\n'
+            )
+            snapshot_file.write('{"records": 1}\n')
+        target = Database(StubIndex(), RateLimiter("test"))
+
+        NamespaceSnapshot(path).restore(target)
+
+        assert target.fetch_vectors(["a"]) == [
+            {"id": "a", "values": [0.5, 0.25], "metadata": {"text": "x"}}
+        ]
+
+    def test_round_trip_without_metadata(self, snapshot):
+        """Test that a record without metadata is exported without it, so it can be upserted again."""
+        source = Database(StubIndex([{"_id": "bare"}]), RateLimiter("test"))
+        snapshot.export(source)
+        target = Database(StubIndex(), RateLimiter("test"))
+
+        assert snapshot.restore(target) == 1
+
+        assert target.fetch_vectors(["bare"]) == source.fetch_vectors(["bare"])
+        assert "metadata" not in target.fetch_vectors(["bare"])[0]
+
+    def test_empty_namespace(self, snapshot):
+        """Test that an empty namespace exports a snapshot with no chunks."""
+        assert snapshot.export(Database(StubIndex(), RateLimiter("test"))) == 0
+        assert list(snapshot.chunks()) == []
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that a file without the snapshot header isn't restored."""
+        path = tmp_path / "other.jsonl.gz"
+        with gzip.open(path, "wt") as other_file:
+            other_file.write('{"model": "something else"}\n')
+
+        with pytest.raises(ValueError):
+            list(NamespaceSnapshot(path).chunks())
+
+    def test_failed_export_leaves_no_snapshot(self, source, snapshot, tmp_path):
+        """Test that an export that fails partway doesn't leave a snapshot that looks complete."""
+        fetch_vectors = source.fetch_vectors
+        pages = iter(range(3))
+
+        def failing_fetch_vectors(ids):
+            if next(pages) == 2:
+                raise RuntimeError("throttled")
+            return fetch_vectors(ids)
+
+        source.fetch_vectors = failing_fetch_vectors
+
+        with pytest.raises(RuntimeError):
+            snapshot.export(source)
+
+        assert list((tmp_path / "snapshots").iterdir()) == []
+
+    @pytest.mark.parametrize(
+        "trailer",
+        ["", '{"records": 3}\n', '{"records": 1}\n[{"id": "b", "values": [0.5]}]\n'],
+    )
+    def test_incomplete_snapshot_is_not_restored(self, tmp_path, trailer):
+        """Test that a snapshot without a matching trailer is rejected before anything is upserted."""
+        path = tmp_path / "diary.jsonl.gz"
+        with gzip.open(path, "wt") as snapshot_file:
+            snapshot_file.write('{"format": "diary-snapshot", "version": 2}\n')
+            snapshot_file.write('[{"id": "a", "values": [0.5]}]\n')
+            snapshot_file.write(trailer)
+        target = Database(StubIndex(), RateLimiter("test"))
+
+        with pytest.raises(ValueError):
+            NamespaceSnapshot(path).restore(target)
+
+        assert not target.has_data()
@@ -0,0 +1,192 @@
+from unittest.mock import Mock
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+
+from rag.summarizer import (
+    CATEGORY_MONTH_SUMMARY,
+    CATEGORY_SUMMARY,
+    MONTH_SUMMARY,
+    WEEK_SUMMARY,
+    DiarySummarizer,
+    removed_summary_ids,
+    summary_id,
+    summary_ids,
+)
+from ratelimit import RateLimiter
+
+
+class TestDiarySummarizer:
+    """Test suite for DiarySummarizer class."""
+
+    @pytest.fixture
+    def chat_model(self):
+        """A mock chat model that answers with the scope it was asked to summarize."""
+        chat_model = Mock(spec=BaseChatModel)
+        chat_model.invoke.side_effect = lambda messages: AIMessage(
+            content=f"summary of {messages[1].content.splitlines()[0]}"
+        )
+        return chat_model
+
+    @pytest.fixture
+    def summarizer(self, chat_model):
+        """Create a DiarySummarizer around the mock chat model."""
+        return DiarySummarizer(chat_model=chat_model, limiter=RateLimiter("test"))
+
+    @pytest.fixture
+    def documents(self):
+        """Parsed entries from two weeks of the same month."""
+        return [
+            {
+                "text": "- Shipped search",
+                "filename": "2024-01 (week 3).md",
+                "Category": "Notes",
+                "Day of Week": "Monday",
+            },
+            {
+                "text": "- [x] Ship search",
+                "filename": "2024-01 (week 3).md",
+                "Category": "Goals",
+            },
+            {
+                "text": "- Planned billing",
+                "filename": "2024-01 (week 4).md",
+                "Category": "Notes",
+                "Day of Week": "Friday",
+            },
+        ]
+
+    def test_summarize_creates_every_tier(self, summarizer, documents):
+        """Test that a first run creates week, month, and category summaries."""
+        records = summarizer.summarize(documents, {})
+
+        ids = {record["_id"] for record in records}
+        assert ids == {
+            summary_id(WEEK_SUMMARY, "2024-01 (week 3).md"),
+            summary_id(WEEK_SUMMARY, "2024-01 (week 4).md"),
+            summary_id(MONTH_SUMMARY, "2024-01"),
+            summary_id(CATEGORY_MONTH_SUMMARY, "Notes-2024-01"),
+            summary_id(CATEGORY_MONTH_SUMMARY, "Goals-2024-01"),
+            summary_id(CATEGORY_SUMMARY, "Notes"),
+            summary_id(CATEGORY_SUMMARY, "Goals"),
+        }
+        assert set(ids) == set(summary_ids(documents))
+
+    def test_summary_records_are_typed(self, summarizer, documents):
+        """Test that summary records carry their type, source hash, and prompt metadata."""
+        records = summarizer.summarize(documents, {})
+
+        week = next(r for r in records if r["Record Type"] == WEEK_SUMMARY)
+        assert (
+            week["text"] == "summary of Summarize the diary week 2024-01 (week 3).md:"
+        )
+        assert week["filename"] == "2024-01 (week 3).md"
+        assert week["Category"] == "Week Summary"
+        assert week["Source Hash"]
+
+    def test_unchanged_summaries_are_not_regenerated(
+        self, summarizer, chat_model, documents
+    ):
+        """Test that a rerun with the same entries produces nothing."""
+        existing = {
+            record["_id"]: record for record in summarizer.summarize(documents, {})
+        }
+        chat_model.invoke.reset_mock()
+
+        assert summarizer.summarize(documents, existing) == []
+        chat_model.invoke.assert_not_called()
+
+    def test_only_changed_week_is_regenerated(self, summarizer, chat_model, documents):
+        """Test that changing one week regenerates that week, its month, and its categories only."""
+        existing = {
+            record["_id"]: record for record in summarizer.summarize(documents, {})
+        }
+        chat_model.invoke.reset_mock()
+
+        documents[2]["text"] = "- Planned billing and invoicing"
+        records = summarizer.summarize(documents, existing)
+
+        assert {record["_id"] for record in records} == {
+            summary_id(WEEK_SUMMARY, "2024-01 (week 4).md"),
+            summary_id(MONTH_SUMMARY, "2024-01"),
+            summary_id(CATEGORY_MONTH_SUMMARY, "Notes-2024-01"),
+            summary_id(CATEGORY_SUMMARY, "Notes"),
+        }
+        # the unchanged week's stored summary is reused for the month
+        month_prompt = next(
+            call.args[0][1].content
+            for call in chat_model.invoke.call_args_list
+            if "the month" in call.args[0][1].content
+        )
+        assert (
+            "summary of Summarize the diary week 2024-01 (week 3).md:" in month_prompt
+        )
+
+    def test_category_is_reduced_from_unchanged_months(
+        self, summarizer, chat_model, documents
+    ):
+        """Test that an edit in one month doesn't summarize the category's entries of other months again."""
+        documents.append(
+            {
+                "text": "- Reviewed billing",
+                "filename": "2024-02 (week 6).md",
+                "Category": "Notes",
+                "Day of Week": "Monday",
+            }
+        )
+        existing = {
+            record["_id"]: record for record in summarizer.summarize(documents, {})
+        }
+        chat_model.invoke.reset_mock()
+
+        documents[3]["text"] = "- Reviewed billing and invoicing"
+        records = summarizer.summarize(documents, existing)
+
+        assert summary_id(CATEGORY_MONTH_SUMMARY, "Notes-2024-01") not in {
+            record["_id"] for record in records
+        }
+        prompts = [call.args[0][1].content for call in chat_model.invoke.call_args_list]
+        assert not any("- Shipped search" in prompt for prompt in prompts)
+        category_prompt = next(
+            prompt
+            for prompt in prompts
+            if prompt.startswith("Summarize the diary category Notes:")
+        )
+        assert (
+            "2024-01: summary of Summarize the diary category Notes in 2024-01:"
+            in category_prompt
+        )
+
+    def test_removed_summary_ids(self, documents):
+        """Test that summaries of removed files are found, and nothing else."""
+        existing_ids = summary_ids(documents) + [
+            summary_id(WEEK_SUMMARY, "2023-12 (week 52).md"),
+            summary_id(MONTH_SUMMARY, "2023-12"),
+            summary_id(CATEGORY_MONTH_SUMMARY, "Notes-2023-12"),
+            "entry-1",
+        ]
+
+        assert removed_summary_ids(documents, existing_ids) == sorted(
+            [
+                summary_id(WEEK_SUMMARY, "2023-12 (week 52).md"),
+                summary_id(MONTH_SUMMARY, "2023-12"),
+                summary_id(CATEGORY_MONTH_SUMMARY, "Notes-2023-12"),
+            ]
+        )
+
+    def test_long_inputs_are_map_reduced(self, chat_model, documents):
+        """Test that texts over the chunk budget are summarized in parts and then reduced."""
+        summarizer = DiarySummarizer(
+            chat_model=chat_model, limiter=RateLimiter("test"), max_chunk_characters=20
+        )
+
+        summarizer.summarize(documents[:2], {})
+
+        # two week entries that don't fit one chunk make 2 partial summaries plus a reduce
+        week_calls = [
+            call
+            for call in chat_model.invoke.call_args_list
+            if "the diary week" in call.args[0][1].content
+        ]
+        assert len(week_calls) >= 3
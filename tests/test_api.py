@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from api import DiaryApi, _send_error_event
+from loadtest.stubs import StubIndex
+from rag.database import Database
+from ratelimit import RateLimiter, RateLimitTimeout
+
+
+class _ControlledLlm:
+    """An Llm whose stream blocks on an event after the first chunk, and records how far it got and when it closed."""
+
+    def __init__(self, chunks=("Hello", " world"), token_seconds=0.0):
+        self.chunks = chunks
+        self.token_seconds = token_seconds
+        self.produced = 0
+        self.release = threading.Event()
+        self.closed = threading.Event()
+
+    def stream(self, query, context):
+        try:
+            for index, chunk in enumerate(self.chunks):
+                if index > 0:
+                    self.release.wait(timeout=5)
+                    time.sleep(self.token_seconds)
+                self.produced += 1
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def _parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestDiaryApi:
+    """Test suite for DiaryApi class."""
+
+    @pytest.fixture
+    def database(self):
+        """A Database around the local index stand-in."""
+        return Database(
+            StubIndex(
+                [{"_id": "entry-1", "text": "- Shipped search", "filename": "a"}]
+            ),
+            RateLimiter("test"),
+        )
+
+    @pytest.fixture
+    def llm(self):
+        """An Llm that finishes as soon as it's released."""
+        return _ControlledLlm()
+
+    def _run(self, api, test):
+        async def run():
+            # like run_api.py, so a disconnect cancels the handler right away
+            server = TestServer(api.application(), handler_cancellation=True)
+            async with TestClient(server) as client:
+                await test(client)
+
+        asyncio.run(run())
+
+    def test_health(self, database, llm):
+        """Test that health reports the concurrency limit."""
+
+        async def test(client):
+            response = await client.get("/health")
+            assert response.status == 200
+            assert await response.json() == {
+                "status": "ok",
+                "in_flight": 0,
+                "max_concurrency": 4,
+            }
+
+        self._run(DiaryApi(database, llm, max_concurrency=4), test)
+
+    def test_retrieve(self, database, llm):
+        """Test that retrieve returns the retrieved entries."""
+
+        async def test(client):
+            response = await client.post(
+                "/retrieve", json={"question": "What did I ship?"}
+            )
+            assert response.status == 200
+            documents = (await response.json())["documents"]
+            assert [document["id"] for document in documents] == ["entry-1"]
+            assert documents[0]["fields"]["text"] == "- Shipped search"
+
+        self._run(DiaryApi(database, llm), test)
+
+    @pytest.mark.parametrize("body", [{}, {"question": "  "}, {"question": 1}, []])
+    def test_requires_a_question(self, database, llm, body):
+        """Test that a request without a question is rejected."""
+
+        async def test(client):
+            response = await client.post("/retrieve", json=body)
+            assert response.status == 400
+
+        self._run(DiaryApi(database, llm), test)
+
+    def test_answer_streams_events(self, database, llm):
+        """Test that answer streams the documents, every chunk, and then done."""
+        llm.release.set()
+
+        async def test(client):
+            response = await client.post(
+                "/answer", json={"question": "What did I ship?"}
+            )
+            assert response.headers["Content-Type"] == "text/event-stream"
+            events = _parse_events(await response.text())
+
+            assert [event for event, _ in events] == [
+                "documents",
+                "chunk",
+                "chunk",
+                "done",
+            ]
+            assert events[0][1]["documents"][0]["id"] == "entry-1"
+            assert "".join(data["text"] for _, data in events[1:3]) == "Hello world"
+
+        self._run(DiaryApi(database, llm), test)
+
+    def test_answer_timeout(self, database, llm):
+        """Test that an answer that takes too long ends with an error event and closes the stream."""
+
+        async def test(client):
+            response = await client.post(
+                "/answer", json={"question": "What did I ship?"}
+            )
+            events = _parse_events(await response.text())
+
+            assert events[-1] == ("error", {"error": "Answer timed out"})
+            llm.release.set()
+            assert llm.closed.wait(timeout=5)
+
+        self._run(DiaryApi(database, llm, answer_timeout=0.5), test)
+
+    def test_answer_retrieve_timeout(self, database, llm):
+        """Test that a retrieval that takes too long ends the answer with an error event before the Llm is called."""
+        release = threading.Event()
+        retrieve_documents = database.retrieve_documents
+
+        def slow_retrieve_documents(question):
+            release.wait(timeout=5)
+            return retrieve_documents(question)
+
+        database.retrieve_documents = slow_retrieve_documents
+
+        async def test(client):
+            response = await client.post(
+                "/answer", json={"question": "What did I ship?"}
+            )
+            events = _parse_events(await response.text())
+            release.set()
+
+            assert events == [("error", {"error": "Retrieval timed out"})]
+            assert llm.produced == 0
+
+        self._run(DiaryApi(database, llm, retrieve_timeout=0.2), test)
+
+    def test_busy_limiter_is_retryable(self, database, llm):
+        """Test that a limiter timeout is a 503 from retrieve and a retryable error event from answer."""
+
+        def busy_retrieve_documents(question):
+            raise RateLimitTimeout("pinecone is busy")
+
+        def busy_stream(question, context):
+            raise RateLimitTimeout("bedrock is busy")
+
+        async def test(client):
+            database.retrieve_documents = busy_retrieve_documents
+            response = await client.post("/retrieve", json={"question": "Anything?"})
+            assert response.status == 503
+            assert response.headers["Retry-After"] == "1"
+
+            database.retrieve_documents = lambda question: []
+            llm.stream = busy_stream
+            response = await client.post(
+                "/answer", json={"question": "What did I ship?"}
+            )
+            events = _parse_events(await response.text())
+            assert events[-1] == (
+                "error",
+                {"error": "bedrock is busy", "retryable": True},
+            )
+
+        self._run(DiaryApi(database, llm), test)
+
+    def test_disconnect_cancels_the_answer(self, database):
+        """Test that the answer stream is closed early when the client goes away."""
+        llm = _ControlledLlm(chunks=["Hello"] + [" world"] * 1000, token_seconds=0.01)
+
+        async def test(client):
+            response = await client.post(
+                "/answer", json={"question": "What did I ship?"}
+            )
+            await response.content.readuntil(b'"Hello"}\n\n')
+            response.close()
+            await asyncio.sleep(0.2)
+
+            llm.release.set()
+            assert await asyncio.to_thread(llm.closed.wait, 5)
+            assert llm.produced < len(llm.chunks)
+
+        self._run(DiaryApi(database, llm), test)
+
+    def test_requests_past_the_limit_are_rejected(self, database, llm):
+        """Test that a request that can't get a slot in time gets a 503."""
+
+        async def test(client):
+            first = await client.post("/answer", json={"question": "What did I ship?"})
+            await first.content.readuntil(b'"Hello"}\n\n')
+
+            second = await client.post("/retrieve", json={"question": "Anything?"})
+            assert second.status == 503
+
+            llm.release.set()
+            await first.text()
+
+        self._run(DiaryApi(database, llm, max_concurrency=1, queue_timeout=0.2), test)
+
+    def test_error_event_to_a_disconnected_client(self):
+        """Test that failing to send an error event to a client that is gone doesn't raise."""
+
+        class _DisconnectedResponse:
+            async def write(self, data):
+                raise ConnectionResetError("Cannot write to closing transport")
+
+        asyncio.run(_send_error_event(_DisconnectedResponse(), {"error": "failed"}))
@@ -1,6 +1,8 @@
+import json
 import pytest
 from unittest.mock import Mock, patch
 
+from checkpoint import EvaluationCheckpoint
 from evaluator import Evaluator
 from llm import Llm
 from rag.database import Database
@@ -260,3 +262,129 @@ class TestEvaluator:
             predictions=["Hello world! How are you?"],
             references=["Hello world! How are you?"],
         )
+
+    @patch("evaluator.load")
+    def test_evaluate_writes_checkpoint(
+        self,
+        mock_load,
+        mock_model,
+        mock_database,
+        sample_dataset,
+        mock_metric,
+        tmp_path,
+    ):
+        """Test that every finished datapoint is appended to the checkpoint."""
+        mock_load.return_value = mock_metric
+        mock_database.retrieve_documents.return_value = [{"_id": "doc-1"}]
+        mock_model.stream.side_effect = [iter(["first"]), iter(["second"])]
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        Evaluator(mock_model, sample_dataset, mock_database, checkpoint).evaluate()
+
+        lines = [json.loads(line) for line in checkpoint_file.read_text().splitlines()]
+        assert lines[0]["model"] == "model"
+        assert [line["answer"] for line in lines[1:]] == ["first", "second"]
+        assert lines[1]["retrieved_ids"] == ["doc-1"]
+        assert checkpoint.progress()["done"] == 2
+
+    @patch("evaluator.load")
+    def test_evaluate_resumes_from_checkpoint(
+        self,
+        mock_load,
+        mock_model,
+        mock_database,
+        sample_dataset,
+        mock_metric,
+        tmp_path,
+    ):
+        """Test that a rerun skips datapoints that already finished and scores all of them."""
+        mock_load.return_value = mock_metric
+        mock_database.retrieve_documents.return_value = [{"text": "doc"}]
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+
+        # the first run dies on the second datapoint
+        mock_model.stream.side_effect = [iter(["first"]), RuntimeError("throttled")]
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        with pytest.raises(RuntimeError):
+            Evaluator(mock_model, sample_dataset, mock_database, checkpoint).evaluate()
+        mock_metric.compute.assert_not_called()
+
+        mock_model.stream.side_effect = [iter(["second"])]
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        Evaluator(mock_model, sample_dataset, mock_database, checkpoint).evaluate()
+
+        assert mock_model.stream.call_count == 3
+        mock_model.stream.assert_called_with(
+            "What did I accomplish yesterday?", [{"text": "doc"}]
+        )
+        mock_metric.compute.assert_called_once_with(
+            predictions=["first", "second"],
+            references=[
+                "Your goals include completing the project and exercising daily.",
+                "You finished the documentation and attended two meetings.",
+            ],
+        )
+
+    @patch("evaluator.load")
+    def test_checkpoint_for_different_dataset_is_rejected(
+        self,
+        mock_load,
+        mock_model,
+        mock_database,
+        sample_dataset,
+        mock_metric,
+        tmp_path,
+    ):
+        """Test that a checkpoint isn't reused for a different dataset."""
+        mock_load.return_value = mock_metric
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        EvaluationCheckpoint(checkpoint_file, "model", sample_dataset).load()
+
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset[:1])
+
+        with pytest.raises(ValueError):
+            Evaluator(
+                mock_model, sample_dataset[:1], mock_database, checkpoint
+            ).evaluate()
+
+    def test_checkpoint_ignores_partial_last_line(self, sample_dataset, tmp_path):
+        """Test that a line cut short by a crash is ignored."""
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        checkpoint.load()
+        with checkpoint_file.open("a") as file:
+            file.write('{"index": 0, "prompt": "What are')
+
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        assert checkpoint.load() == {}
+
+        # appending after the partial line still produces a readable result
+        checkpoint.append(
+            {
+                "index": 0,
+                "prompt": "What are my goals for this week?",
+                "answer": "goals",
+                "retrieve_seconds": 0.1,
+                "generate_seconds": 0.2,
+            }
+        )
+        completed = EvaluationCheckpoint(
+            checkpoint_file, "model", sample_dataset
+        ).load()
+        assert completed[0]["answer"] == "goals"
+
+    @pytest.mark.parametrize("contents", ["", '{"model": "mod', "not json\n"])
+    def test_checkpoint_without_a_header_starts_over(
+        self, sample_dataset, tmp_path, contents
+    ):
+        """Test that a checkpoint whose header is empty or cut short is replaced by a fresh one."""
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        checkpoint_file.write_text(contents)
+
+        checkpoint = EvaluationCheckpoint(checkpoint_file, "model", sample_dataset)
+        assert checkpoint.load() == {}
+
+        header = json.loads(checkpoint_file.read_text())
+        assert header["model"] == "model"
+        assert not (tmp_path / "checkpoint.jsonl.tmp").exists()
@@ -0,0 +1,142 @@
+from unittest.mock import Mock
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+
+from llm import Llm
+from ratelimit import RateLimiter
+
+MODEL_NAME = "us.meta.llama3-2-90b-instruct-v1:0"
+
+
+class TestLlm:
+    """Test suite for Llm class."""
+
+    @pytest.fixture
+    def chat_model(self):
+        """Create a mock chat model."""
+        chat_model = Mock(spec=BaseChatModel)
+        chat_model.stream.return_value = iter(
+            [
+                AIMessageChunk(content="Your "),
+                AIMessageChunk(content="goals."),
+                AIMessageChunk(
+                    content="",
+                    usage_metadata={
+                        "input_tokens": 1200,
+                        "output_tokens": 2,
+                        "total_tokens": 1202,
+                        "input_token_details": {
+                            "cache_read": 1000,
+                            "cache_creation": 0,
+                        },
+                    },
+                ),
+            ]
+        )
+        return chat_model
+
+    @pytest.fixture
+    def context(self):
+        """Sample Pinecone hits."""
+        return [
+            {"fields": {"text": "- second", "filename": "b.md", "Category": "Notes"}},
+            {"fields": {"text": "- first", "filename": "a.md", "Category": "Goals"}},
+        ]
+
+    def _llm(self, chat_model):
+        return Llm(MODEL_NAME, chat_model=chat_model, limiter=RateLimiter("test"))
+
+    def test_stream_yields_text(self, chat_model, context):
+        """Test that streaming yields the text of each chunk and skips empty ones."""
+        llm = self._llm(chat_model)
+
+        assert list(llm.stream("What are my goals?", context)) == ["Your ", "goals."]
+
+    def test_messages_put_stable_content_first(self, chat_model, context):
+        """Test that instructions come before the entries, which come before the question."""
+        llm = self._llm(chat_model)
+
+        list(llm.stream("What are my goals?", context))
+
+        system, human = chat_model.stream.call_args.args[0]
+        assert "diary" in system.content
+        assert human.content.startswith("Diary entries: ")
+        assert human.content.endswith("Question: What are my goals?")
+
+    def test_entries_keep_the_rerank_order(self, chat_model, context):
+        """Test that the entries reach the model in the order they were retrieved, most relevant first."""
+        llm = self._llm(chat_model)
+
+        list(llm.stream("What are my goals?", context))
+
+        _, human = chat_model.stream.call_args.args[0]
+        assert human.content.index("- second") < human.content.index("- first")
+
+    def test_cache_usage_is_recorded(self, chat_model, context):
+        """Test that cache read and write tokens are accumulated."""
+        llm = self._llm(chat_model)
+
+        list(llm.stream("What are my goals?", context))
+
+        assert llm.cache_usage() == {
+            "input_tokens": 1200,
+            "cache_read_tokens": 1000,
+            "cache_write_tokens": 0,
+        }
+
+    def test_truncated_occurrences_give_the_range(self, chat_model):
+        """Test that an entry with more occurrences than were listed says how many and over what range."""
+        llm = self._llm(chat_model)
+        context = [
+            {
+                "fields": {
+                    "text": "- Team standup",
+                    "filename": "a.md",
+                    "Category": "Notes",
+                    "Occurrence Count": 300,
+                    "First Occurrence": "a.md, Monday",
+                    "Last Occurrence": "z.md, Friday",
+                    "Occurrences": ["a.md, Monday", "b.md, Tuesday"],
+                }
+            }
+        ]
+
+        list(llm.stream("When was standup?", context))
+
+        _, human = chat_model.stream.call_args.args[0]
+        assert (
+            "recorded 300 times, from a.md, Monday to z.md, Friday, including: a.md, Monday; b.md, Tuesday"
+            in human.content
+        )
+
+    def test_hits_are_not_mutated(self, chat_model, context):
+        """Test that converting hits leaves them untouched for other callers."""
+        llm = self._llm(chat_model)
+
+        list(llm.stream("What are my goals?", context))
+
+        assert context[0]["fields"]["text"] == "- second"
+
+    def test_deduplicated_entries_list_their_occurrences(self, chat_model):
+        """Test that a deduplicated entry is expanded with every place it occurred."""
+        llm = self._llm(chat_model)
+        context = [
+            {
+                "fields": {
+                    "text": "- Team standup",
+                    "filename": "a.md",
+                    "Category": "Notes",
+                    "Occurrence Count": 2,
+                    "Occurrences": ["a.md, Monday", "b.md, Tuesday"],
+                    "Variants": ["- Team standup!"],
+                }
+            }
+        ]
+
+        list(llm.stream("When was standup?", context))
+
+        _, human = chat_model.stream.call_args.args[0]
+        assert "recorded 2 times: a.md, Monday; b.md, Tuesday" in human.content
+        assert "also recorded as: - Team standup!" in human.content
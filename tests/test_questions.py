@@ -0,0 +1,38 @@
+import pytest
+
+from questions import is_broad_question
+
+
+class TestIsBroadQuestion:
+    """Test suite for is_broad_question."""
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "What did I accomplish in 2024?",
+            "Summarize my year",
+            "Give me an overview of March",
+            "What were the highlights of last quarter?",
+            "What are all my goals?",
+        ],
+    )
+    def test_broad_questions(self, query):
+        """Test that questions about a period or everything are broad."""
+        assert is_broad_question(query)
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "What did I accomplish on March 6, 2023?",
+            "What did I do on May 3?",
+            "What did I do on the 3rd of May?",
+            "What may have blocked the release?",
+            "Who did I meet in week 29 of 2024?",
+            "What did I do on 2024-03-06?",
+            "When did I have a 1x1 with my manager?",
+            "What did I fix on Monday?",
+        ],
+    )
+    def test_specific_questions(self, query):
+        """Test that lookups of a specific day, date, week, or entry aren't broad."""
+        assert not is_broad_question(query)
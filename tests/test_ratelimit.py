@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+from pinecone.exceptions import PineconeApiException
+
+from ratelimit import (
+    RateLimiter,
+    RateLimitTimeout,
+    TokenBucket,
+    get_limiter,
+    is_throttling_error,
+)
+
+
+def _bedrock_throttle():
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}},
+        "ConverseStream",
+    )
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter class."""
+
+    @pytest.fixture
+    def limiter(self):
+        """A limiter with a rate to adapt and no real backoff delay."""
+        return RateLimiter("test", rate=100.0, max_retries=3, base_delay=0.0)
+
+    def test_is_throttling_error(self):
+        """Test that Bedrock and Pinecone throttling errors are recognized."""
+        assert is_throttling_error(_bedrock_throttle())
+        assert is_throttling_error(PineconeApiException(status=429))
+        assert not is_throttling_error(PineconeApiException(status=500))
+        assert not is_throttling_error(ValueError("nope"))
+
+    def test_call_retries_throttled_calls(self, limiter):
+        """Test that a throttled call is retried until it succeeds."""
+        outcomes = [_bedrock_throttle(), _bedrock_throttle(), "done"]
+
+        def function():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert limiter.call(function) == "done"
+
+        metrics = limiter.metrics()
+        assert metrics["attempts"] == 3
+        assert metrics["throttles"] == 2
+        assert metrics["retries"] == 2
+
+    def test_call_gives_up_after_max_retries(self, limiter):
+        """Test that the throttling error is raised once retries run out."""
+
+        def function():
+            raise _bedrock_throttle()
+
+        with pytest.raises(ClientError):
+            limiter.call(function)
+
+        assert limiter.metrics()["attempts"] == 4
+
+    def test_call_does_not_retry_other_errors(self, limiter):
+        """Test that non-throttling errors are raised immediately."""
+        calls = []
+
+        def function():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            limiter.call(function)
+
+        assert len(calls) == 1
+
+    def test_throttling_decreases_rate_and_success_increases_it(self, limiter):
+        """Test the AIMD adjustment of the rate."""
+        outcomes = [_bedrock_throttle(), "done"]
+
+        def function():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        limiter.call(function)
+
+        # halved by the throttle, then increased by 0.1 on success
+        assert limiter.metrics()["rate"] == pytest.approx(50.1)
+
+    def test_stream_retries_before_first_chunk(self, limiter):
+        """Test that a stream throttled before its first chunk is restarted."""
+        attempts = []
+
+        def generate():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise _bedrock_throttle()
+            yield "Hello"
+            yield " world"
+
+        assert "".join(limiter.stream(generate)) == "Hello world"
+        assert len(attempts) == 2
+
+    def test_stream_does_not_retry_after_first_chunk(self, limiter):
+        """Test that a stream failing midway raises instead of repeating chunks."""
+
+        def generate():
+            yield "Hello"
+            raise _bedrock_throttle()
+
+        stream = limiter.stream(generate)
+
+        assert next(stream) == "Hello"
+        with pytest.raises(ClientError):
+            next(stream)
+
+    def test_max_concurrency(self):
+        """Test that no more than max_concurrency calls run at once."""
+        limiter = RateLimiter("test", max_concurrency=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def function():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        threads = [
+            threading.Thread(target=limiter.call, args=(function,)) for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert limiter.metrics()["max_queue_wait"] > 0
+
+    def test_acquire_timeout(self):
+        """Test that a call that can't get a slot in time raises instead of waiting on."""
+        limiter = RateLimiter("test", max_concurrency=1, acquire_timeout=0.05)
+        release = threading.Event()
+        stream = limiter.stream(lambda: iter(["held"]))
+        holder = threading.Thread(
+            target=lambda: (next(stream), release.wait(timeout=5), stream.close())
+        )
+        holder.start()
+        time.sleep(0.05)
+
+        start = time.perf_counter()
+        with pytest.raises(RateLimitTimeout):
+            limiter.call(lambda: "result")
+        release.set()
+        holder.join()
+
+        assert time.perf_counter() - start < 1
+        assert limiter.metrics()["acquire_timeouts"] == 1
+        assert limiter.call(lambda: "result") == "result"
+
+    def test_token_bucket_take_timeout(self):
+        """Test that taking a token gives up when the next one is further away than the timeout."""
+        bucket = TokenBucket(rate=1.0, burst=1.0)
+
+        assert bucket.take(timeout=0.01)
+        assert not bucket.take(timeout=0.01)
+
+    def test_token_bucket_paces_calls(self):
+        """Test that the token bucket blocks once the burst is used up."""
+        bucket = TokenBucket(rate=20.0, burst=1.0)
+
+        start = time.perf_counter()
+        for _ in range(3):
+            bucket.take()
+
+        assert time.perf_counter() - start >= 0.09
+
+    def test_get_limiter_is_shared_per_name(self):
+        """Test that the same name gets the same limiter, and Bedrock models get their own."""
+        assert get_limiter("bedrock:model-a") is get_limiter("bedrock:model-a")
+        assert get_limiter("bedrock:model-a") is not get_limiter("bedrock:model-b")
@@ -0,0 +1,235 @@
+import logging
+from unittest.mock import Mock
+
+import pytest
+
+from llm import Llm
+from routing import (
+    QueryRouter,
+    RoutingLlm,
+    passes_answer_check,
+    passes_prefix_check,
+)
+
+
+def _hit(text, score=0.5, filename="2024-01 (week 3).md"):
+    return {
+        "_id": text,
+        "_score": score,
+        "fields": {"text": text, "filename": filename},
+    }
+
+
+class TestRouting:
+    """Test suite for QueryRouter and RoutingLlm classes."""
+
+    @pytest.fixture
+    def small(self):
+        """Create a mock small Llm."""
+        return Mock(spec=Llm)
+
+    @pytest.fixture
+    def large(self):
+        """Create a mock large Llm."""
+        return Mock(spec=Llm)
+
+    def test_lookup_question_routes_small(self):
+        """Test that a specific lookup with few hits goes to the small model."""
+        decision = QueryRouter().route(
+            "When did I have a 1x1 with my manager?", [_hit("- 1x1 with manager")]
+        )
+
+        assert not decision.use_large
+
+    def test_broad_question_routes_large(self):
+        """Test that aggregating questions go to the large model."""
+        decision = QueryRouter().route(
+            "What did I accomplish in 2024?", [_hit("- Shipped feature")]
+        )
+
+        assert decision.use_large
+        assert "broad question" in decision.reasons
+
+    def test_reasoning_question_routes_large(self):
+        """Test that questions asking why or how go to the large model."""
+        decision = QueryRouter().route(
+            "Why did the release slip?", [_hit("- Release slipped")]
+        )
+
+        assert decision.reasons == ["reasoning question"]
+
+    def test_specific_date_routes_small(self):
+        """Test that a lookup of a specific date isn't a broad question, even though it names a month and year."""
+        decision = QueryRouter().route(
+            "What did I accomplish on March 6, 2023?", [_hit("- Shipped feature")]
+        )
+
+        assert not decision.use_large
+
+    def test_many_similar_hits_route_large(self):
+        """Test that many equally relevant hits go to the large model."""
+        context = [_hit(f"- entry {i}", score=0.5) for i in range(15)]
+
+        decision = QueryRouter().route("What about the database migration?", context)
+
+        assert decision.use_large
+
+    def test_many_hits_with_clear_winner_route_small(self):
+        """Test that many hits are fine for the small model when one clearly stands out."""
+        context = [_hit("- the answer", score=0.95)] + [
+            _hit(f"- entry {i}", score=0.1) for i in range(14)
+        ]
+
+        decision = QueryRouter().route("What about the database migration?", context)
+
+        assert not decision.use_large
+
+    def test_large_context_routes_large(self):
+        """Test that a lot of context goes to the large model."""
+        decision = QueryRouter(max_small_context_characters=10).route(
+            "When was the standup?", [_hit("- a long standup entry")]
+        )
+
+        assert decision.use_large
+
+    def test_passes_answer_check(self):
+        """Test the cheap answer check."""
+        context = [_hit("- standup")]
+
+        assert passes_answer_check(
+            "You had standup on Monday, see 2024-01 (week 3).md", context
+        )
+        assert not passes_answer_check("", context)
+        assert not passes_answer_check(
+            "I don't know when that happened, see 2024-01 (week 3).md", context
+        )
+        assert not passes_answer_check(
+            "You had standup on Monday with the whole team.", context
+        )
+
+    @pytest.mark.parametrize(
+        "prefix",
+        [
+            "I don't know when standup was.",
+            "I couldn't find any entry about standup.",
+            "No entries mention a standup.",
+            "There are no entries that cover standup.",
+            "The diary entries don't mention standup.",
+        ],
+    )
+    def test_prefix_check_rejects_non_answers(self, prefix):
+        """Test that answers opening with the assistant's non-answer phrasing fail the check."""
+        assert not passes_prefix_check(prefix)
+
+    @pytest.mark.parametrize(
+        "prefix",
+        [
+            "You were unable to finish the migration on Monday, see 2024-01 (week 3).md",
+            "There was no information about the outage until Tuesday, when you wrote it up.",
+            "You noted that the root cause was not mentioned in the postmortem.",
+        ],
+    )
+    def test_prefix_check_accepts_answers_using_the_phrases(self, prefix):
+        """Test that real answers mentioning being unable to do something or a lack of information pass."""
+        assert passes_prefix_check(prefix)
+
+    def test_small_answer_passing_check_is_used(self, small, large):
+        """Test that a good small model answer is returned without calling the large model."""
+        small.stream.return_value = iter(
+            ["Standup was Monday, ", "2024-01 (week 3).md"]
+        )
+        context = [_hit("- standup")]
+
+        answer = "".join(RoutingLlm(small, large).stream("When was standup?", context))
+
+        assert answer == "Standup was Monday, 2024-01 (week 3).md"
+        large.stream.assert_not_called()
+
+    def test_small_answer_failing_check_escalates(self, small, large):
+        """Test that a failing small model answer is replaced by the large model's."""
+        small.stream.return_value = iter(["I don't know."])
+        large.stream.return_value = iter(
+            ["Standup was Monday, ", "2024-01 (week 3).md"]
+        )
+        context = [_hit("- standup")]
+
+        answer = "".join(RoutingLlm(small, large).stream("When was standup?", context))
+
+        assert answer == "Standup was Monday, 2024-01 (week 3).md"
+        large.stream.assert_called_once_with("When was standup?", context)
+
+    def test_long_small_answer_streams_after_the_prefix(self, small, large):
+        """Test that once the start of a long answer passes the check, the rest streams as it comes."""
+        small.stream.return_value = iter(
+            ["Standup was Monday, ", "then Tuesday, ", "see 2024-01 (week 3).md"]
+        )
+        context = [_hit("- standup")]
+
+        chunks = list(
+            RoutingLlm(small, large, check_characters=20).stream(
+                "When was standup?", context
+            )
+        )
+
+        assert chunks == [
+            "Standup was Monday, ",
+            "then Tuesday, ",
+            "see 2024-01 (week 3).md",
+        ]
+        large.stream.assert_not_called()
+
+    def test_long_small_answer_failing_prefix_escalates(self, small, large):
+        """Test that a long answer opening with a non-answer escalates without reading the rest of it."""
+
+        def small_stream(query, context):
+            yield "I don't know when standup was. "
+            pytest.fail("read past the prefix")
+
+        small.stream.side_effect = small_stream
+        large.stream.return_value = iter(["Standup was Monday, 2024-01 (week 3).md"])
+
+        chunks = list(
+            RoutingLlm(small, large, check_characters=20).stream(
+                "When was standup?", [_hit("- standup")]
+            )
+        )
+
+        assert chunks == ["Standup was Monday, 2024-01 (week 3).md"]
+
+    def test_savings_log_records_time_to_first_token(self, small, large, caplog):
+        """Test that the savings log has the small model's time to first token and the large model's for comparison."""
+        large.stream.return_value = iter(["You did ", "a lot."])
+        small.stream.return_value = iter(["Standup was Monday, 2024-01 (week 3).md"])
+        routing_llm = RoutingLlm(small, large)
+        list(routing_llm.stream("Summarize my year", [_hit("- entry")]))
+
+        with caplog.at_level(logging.INFO):
+            list(routing_llm.stream("When was standup?", [_hit("- standup")]))
+
+        assert "first token after" in caplog.text
+        assert "to first token" in caplog.text
+
+    def test_no_escalation_streams_small_directly(self, small, large):
+        """Test that without escalation the small model's chunks are streamed as-is."""
+        small.stream.return_value = iter(["I don't ", "know."])
+        context = [_hit("- standup")]
+
+        chunks = list(
+            RoutingLlm(small, large, escalate=False).stream(
+                "When was standup?", context
+            )
+        )
+
+        assert chunks == ["I don't ", "know."]
+        large.stream.assert_not_called()
+
+    def test_broad_question_streams_large(self, small, large):
+        """Test that a broad question streams from the large model only."""
+        large.stream.return_value = iter(["You did ", "a lot."])
+
+        chunks = list(
+            RoutingLlm(small, large).stream("Summarize my year", [_hit("- entry")])
+        )
+
+        assert chunks == ["You did ", "a lot."]
+        small.stream.assert_not_called()
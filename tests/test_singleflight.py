@@ -0,0 +1,210 @@
+import threading
+import time
+
+from unittest.mock import Mock
+
+import pytest
+from pinecone.core.openapi.db_data.models import (
+    Hit,
+    SearchRecordsResponse,
+    SearchRecordsResponseResult,
+    SearchUsage,
+)
+
+from rag.database import Database
+from ratelimit import RateLimiter
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight class."""
+
+    @pytest.fixture
+    def single_flight(self):
+        """Create a SingleFlight."""
+        return SingleFlight()
+
+    def _run_concurrently(self, count, function):
+        results = [None] * count
+        errors = [None] * count
+
+        def run(index):
+            try:
+                results[index] = function()
+            except Exception as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        return results, errors
+
+    def test_do_joins_concurrent_calls(self, single_flight):
+        """Test that concurrent calls with the same key run the function once."""
+        calls = []
+        release = threading.Event()
+
+        def retrieve():
+            calls.append(1)
+            release.wait(timeout=5)
+            return [{"fields": {"text": "entry"}}]
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._run_concurrently(
+            5, lambda: single_flight.do("question", retrieve)
+        )
+
+        assert len(calls) == 1
+        assert errors == [None] * 5
+        assert all(result == [{"fields": {"text": "entry"}}] for result in results)
+
+    def test_do_gives_waiters_their_own_copy(self, single_flight):
+        """Test that a waiter mutating its result doesn't affect anyone else."""
+        release = threading.Event()
+
+        def retrieve():
+            release.wait(timeout=5)
+            return {"fields": {"text": "entry"}}
+
+        threading.Timer(0.2, release.set).start()
+        results, _ = self._run_concurrently(
+            3, lambda: single_flight.do("question", retrieve)
+        )
+
+        assert len({id(result) for result in results}) == 3
+
+    def test_do_joins_retrievals_of_pinecone_hits(self, single_flight):
+        """Test that waiters joining a retrieval get usable copies of what Pinecone really returns."""
+        release = threading.Event()
+        index = Mock()
+
+        def search(**kwargs):
+            release.wait(timeout=5)
+            return SearchRecordsResponse(
+                result=SearchRecordsResponseResult(
+                    hits=[Hit(_id="a", _score=0.5, fields={"text": "entry"})]
+                ),
+                usage=SearchUsage(read_units=1),
+            )
+
+        index.search.side_effect = search
+        database = Database(index, RateLimiter("test"))
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._run_concurrently(
+            3,
+            lambda: single_flight.do(
+                ("retrieve", "question"),
+                lambda: database.retrieve_documents("question"),
+            ),
+        )
+
+        assert errors == [None] * 3
+        assert index.search.call_count == 1
+        assert all(
+            result == [{"_id": "a", "_score": 0.5, "fields": {"text": "entry"}}]
+            for result in results
+        )
+
+    def test_do_propagates_errors_to_waiters(self, single_flight):
+        """Test that every waiter sees the error of the shared call."""
+        release = threading.Event()
+
+        def retrieve():
+            release.wait(timeout=5)
+            raise ValueError("throttled")
+
+        threading.Timer(0.2, release.set).start()
+        _, errors = self._run_concurrently(
+            3, lambda: single_flight.do("question", retrieve)
+        )
+
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_do_does_not_cache_finished_calls(self, single_flight):
+        """Test that a call after the previous one finished runs the function again."""
+        calls = []
+
+        single_flight.do("question", lambda: calls.append(1))
+        single_flight.do("question", lambda: calls.append(1))
+
+        assert len(calls) == 2
+
+    def test_stream_shares_chunks_with_late_subscribers(self, single_flight):
+        """Test that a subscriber joining mid-stream still gets every chunk."""
+        calls = []
+        second_chunk = threading.Event()
+
+        def generate():
+            calls.append(1)
+            yield "Hello"
+            second_chunk.wait(timeout=5)
+            yield " world"
+
+        first = single_flight.stream("question", generate)
+        assert next(first) == "Hello"
+
+        second = single_flight.stream("question", generate)
+        assert next(second) == "Hello"
+        second_chunk.set()
+
+        assert "".join(first) == " world"
+        assert "".join(second) == " world"
+        assert len(calls) == 1
+
+    def test_stream_propagates_errors(self, single_flight):
+        """Test that an error in the shared stream reaches subscribers after the chunks produced before it."""
+
+        def generate():
+            yield "partial"
+            raise ValueError("throttled")
+
+        stream = single_flight.stream("question", generate)
+
+        assert next(stream) == "partial"
+        with pytest.raises(ValueError):
+            next(stream)
+
+    def test_stream_cancelled_when_last_subscriber_leaves(self, single_flight):
+        """Test that the underlying iterator is closed once nobody is listening."""
+        closed = threading.Event()
+        proceed = threading.Event()
+
+        def generate():
+            try:
+                yield "first"
+                proceed.wait(timeout=5)
+                yield "second"
+                yield "third"
+            finally:
+                closed.set()
+
+        stream = single_flight.stream("question", generate)
+        assert next(stream) == "first"
+        stream.close()
+        proceed.set()
+
+        assert closed.wait(timeout=5)
+
+    def test_stream_after_cancellation_starts_fresh(self, single_flight):
+        """Test that a new subscriber doesn't join a cancelled stream."""
+        calls = []
+        proceed = threading.Event()
+
+        def generate():
+            calls.append(1)
+            yield "first"
+            proceed.wait(timeout=5)
+            yield "second"
+
+        stream = single_flight.stream("question", generate)
+        next(stream)
+        stream.close()
+
+        proceed.set()
+        time.sleep(0.05)
+        assert "".join(single_flight.stream("question", generate)) == "firstsecond"
+        assert len(calls) == 2